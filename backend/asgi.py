@@ -0,0 +1,3 @@
+from async_app import create_app
+
+app = create_app()
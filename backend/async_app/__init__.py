@@ -0,0 +1,137 @@
+"""
+ASGI serving mode. The read-heavy endpoints (search, autocomplete, recipe
+lookup, recommendations, the saved meal plan) are served by async handlers
+using AsyncElasticsearch and the async Firestore client, so a slow dependency
+only parks a coroutine instead of a whole worker. Every other route falls
+through to the regular Flask app, run in a thread by the ASGI server.
+
+Run from backend/:
+    hypercorn asgi:app --bind 0.0.0.0:5000
+"""
+import asyncio
+
+from hypercorn.middleware import AsyncioWSGIMiddleware
+from quart import Quart
+from werkzeug.exceptions import HTTPException
+
+from app import create_app as create_sync_app
+from config import Config
+
+
+class RouteFallback:
+    """
+    ASGI app that sends requests the async app has a route for to it and
+    everything else to the wrapped WSGI Flask app.
+    """
+
+    def __init__(self, async_app, sync_app):
+        self.async_app = async_app
+        self.sync_app = AsyncioWSGIMiddleware(sync_app)
+
+    def _handles(self, scope):
+        # CORS preflights go to the Flask app, where flask-cors answers them
+        if scope["method"] == "OPTIONS":
+            return False
+        adapter = self.async_app.url_map.bind("localhost")
+        try:
+            adapter.match(scope["path"], method=scope["method"])
+        except HTTPException:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self._handles(scope):
+            return await self.sync_app(scope, receive, send)
+        return await self.async_app(scope, receive, send)
+
+
+def alias_watched_caches(sync_app):
+    """
+    The shared caches that are invalidated when the recipes alias moves.
+    """
+    return [
+        cache for cache in (sync_app.search_cache, sync_app.candidate_cache)
+        if cache is not None and cache.generation_fn is not None
+    ]
+
+
+async def watch_alias(app, caches, interval):
+    """
+    Poll the recipes alias every `interval` seconds and pass its target to
+    each cache's update_generation. Runs as a background task on the async
+    client (the sync one in a thread if the async client failed to connect),
+    so cache lookups on the event loop never wait on Elasticsearch.
+    """
+    from services.elastic import alias_target, alias_target_async
+    alias = app.sync_app.INDEX_NAME or app.config.get("ES_INDEX", "recipes")
+    while True:
+        try:
+            if app.es is not None:
+                generation = await alias_target_async(app.es, alias)
+            else:
+                generation = await asyncio.to_thread(alias_target, app.sync_app.client, alias)
+        except Exception as e:
+            print(f"Warning: alias check failed: {e}")
+        else:
+            for cache in caches:
+                cache.update_generation(generation)
+        await asyncio.sleep(interval)
+
+
+def create_app(config_object=Config, sync_app=None, es=None, db=None):
+    """
+    The ASGI application. sync_app (built with app.create_app by default)
+    owns the shared state - caches, in-process indexes, Firebase auth - and
+    serves the routes without an async handler. es / db replace the async
+    clients normally created at startup.
+    """
+    from async_app.routes import register_blueprints
+
+    sync_app = sync_app or create_sync_app(config_object)
+    app = Quart(__name__)
+    app.config.from_object(config_object)
+    app.url_map.strict_slashes = False
+    app.sync_app = sync_app
+    app.es = es
+    app.db = db
+    app.alias_watch = None
+
+    @app.before_serving
+    async def init_async_clients():
+        if app.es is None:
+            from services.elastic import init_async_elastic
+            app.es = await init_async_elastic()
+        if app.db is None and sync_app.db is not None:
+            from services.firebase import init_firestore_async
+            app.db = init_firestore_async()
+
+        # Move the caches' alias checks off the lookup path: TTLCache.get would
+        # otherwise make a blocking ES call on the event loop
+        caches = alias_watched_caches(sync_app)
+        for cache in caches:
+            cache.generation_fn = None
+        if caches:
+            interval = app.config.get("SEARCH_CACHE_ALIAS_CHECK", 10)
+            app.alias_watch = asyncio.create_task(watch_alias(app, caches, interval))
+
+    @app.after_serving
+    async def close_async_clients():
+        if app.alias_watch is not None:
+            app.alias_watch.cancel()
+            app.alias_watch = None
+        if app.es is not None and hasattr(app.es, "close"):
+            await app.es.close()
+
+    @app.after_request
+    async def add_cors_headers(response):
+        # Same policy init_extensions gives the Flask app
+        from quart import request
+        origin = request.headers.get("Origin")
+        if origin in app.config.get("CORS_ORIGINS", []):
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Vary"] = "Origin"
+        return response
+
+    register_blueprints(app)
+    return RouteFallback(app, sync_app)
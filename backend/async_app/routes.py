@@ -0,0 +1,270 @@
+import asyncio
+from functools import wraps
+
+from quart import Blueprint, jsonify, request, current_app as app
+
+from routes.recipes import MAX_IDS
+from routes.search import (
+    autocomplete_results, es_search_payload, es_search_request, local_search_payload, parse_search_args,
+    search_cache_key,
+)
+from services import query_builder
+from services.pregenerate_plans import NEXT_PLAN
+from services.query_builder import AUTOCOMPLETE_TEMPLATE, MACRO_TEMPLATE, SEARCH_TEMPLATE
+from services.recommendations import (
+    add_to_pool, assemble_meal_plan, candidate_lookup, favorite_pool, get_fallback_recipes,
+    pick_recipes, pool_requests, remember_candidates,
+)
+from utils.dates import get_current_week_start
+from utils.formatters import format_recipe_for_frontend
+
+api = Blueprint("async_api", __name__)
+meal_plan = Blueprint("async_meal_plan", __name__)
+
+
+def register_blueprints(app):
+    app.register_blueprint(api, url_prefix="/api")
+    app.register_blueprint(meal_plan, url_prefix="/meal-plan")
+
+
+def shared_state(view):
+    """
+    Run the handler inside the Flask app's context: the caches, in-process
+    indexes and helpers shared with the sync routes all go through
+    flask.current_app.
+    """
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        with app.sync_app.app_context():
+            return await view(*args, **kwargs)
+    return wrapper
+
+
+def _index_name():
+    return app.sync_app.INDEX_NAME or app.config.get("ES_INDEX", "recipes")
+
+
+@api.route("/search")
+@shared_state
+async def search_recipes():
+    state = app.sync_app
+    try:
+        params = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cache_key = search_cache_key(params)
+    if state.search_cache is not None:
+        cached = state.search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+    if state.search_engine is not None:
+        try:
+            payload = local_search_payload(state.search_engine, params)
+        except Exception as e:
+            return jsonify({"error": f"An error occurred during search: {e}"}), 500
+    else:
+        if app.es is None:
+            return jsonify({"error": "Elasticsearch not initialized"}), 500
+        try:
+            index, template_params = es_search_request(params, _index_name())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            response = await query_builder.search_async(app.es, index, SEARCH_TEMPLATE, template_params)
+            payload = es_search_payload(params, response)
+        except Exception as e:
+            return jsonify({"error": f"An error occurred during search: {e}"}), 500
+
+    if state.search_cache is not None:
+        state.search_cache.set(cache_key, payload)
+    return jsonify(payload)
+
+
+@api.route("/autocomplete")
+@shared_state
+async def autocomplete():
+    if app.es is None:
+        return jsonify({"error": "Elasticsearch not initialized"}), 500
+
+    prefix = request.args.get('q', "").strip()
+    size = min(max(request.args.get('size', 8, type=int), 1), 20)
+    if not prefix:
+        return jsonify([])
+
+    try:
+        response = await query_builder.search_async(
+            app.es, _index_name(), AUTOCOMPLETE_TEMPLATE, query_builder.autocomplete_params(prefix, size)
+        )
+        return jsonify(autocomplete_results(response))
+    except Exception as e:
+        return jsonify({"error": f"An error occurred during autocomplete: {e}"}), 500
+
+
+@api.route("/recipes")
+async def get_recipes_by_ids():
+    if app.es is None:
+        return jsonify({"error": "Elasticsearch not initialized"}), 500
+
+    ids = []
+    for value in request.args.getlist('ids'):
+        ids.extend(i.strip() for i in value.split(',') if i.strip())
+    ids = list(dict.fromkeys(ids))
+
+    if not ids:
+        return jsonify({"error": "Missing ids query parameter"}), 400
+    if len(ids) > MAX_IDS:
+        return jsonify({"error": f"At most {MAX_IDS} ids per request"}), 400
+
+    try:
+        response = await app.es.mget(index=_index_name(), ids=ids)
+        return jsonify([doc['_source'] for doc in response['docs'] if doc.get('found')])
+    except Exception as e:
+        return jsonify({"error": f"An error occurred fetching recipes: {e}"}), 500
+
+
+async def macro_candidates_async(macros, meal_type=None):
+    """
+    services.recommendations.macro_candidates with the search awaited.
+    """
+    key, cached, template_params = candidate_lookup(macros, meal_type)
+    if cached is not None:
+        return cached
+    response = await query_builder.search_async(app.es, _index_name(), MACRO_TEMPLATE, template_params)
+    return remember_candidates(key, response)
+
+
+async def fallback_recipes_async(macros, count_needed, exclude_ids, meal_type=None):
+    """
+    services.recommendations.get_fallback_recipes with the searches awaited.
+    """
+    if app.sync_app.macro_index is not None:
+        # In-process and CPU-only, nothing to await
+        return get_fallback_recipes(macros, count_needed, exclude_ids, meal_type)
+    results = await _fallback_recipes_async(macros, count_needed, exclude_ids, meal_type)
+    if meal_type and len(results) < count_needed:
+        exclude_ids = set(exclude_ids or ()) | {recipe["id"] for recipe in results}
+        results += await _fallback_recipes_async(macros, count_needed - len(results), exclude_ids)
+    return results
+
+
+async def _fallback_recipes_async(macros, count_needed, exclude_ids, meal_type=None):
+    if app.es is None:
+        return []
+    try:
+        return pick_recipes(await macro_candidates_async(macros, meal_type), count_needed, exclude_ids)
+    except Exception as e:
+        print(f"Error fetching fallback recipes: {e}")
+        return []
+
+
+@api.route("/recommendations/<user_id>")
+@shared_state
+async def get_recommendations(user_id):
+    state = app.sync_app
+    if app.db is None or (app.es is None and state.macro_index is None):
+        return jsonify({"error": "Services not initialized"}), 500
+
+    try:
+        user_doc = await app.db.collection('users').document(user_id).get()
+        if not user_doc.exists:
+            return jsonify({"error": "User not found"}), 404
+
+        macros = (user_doc.to_dict() or {}).get('macros')
+        if not macros:
+            return jsonify({"error": "User has no macro data"}), 404
+    except Exception as e:
+        return jsonify({"error": f"Firebase error: {str(e)}"}), 500
+
+    if state.macro_index is not None:
+        from services.macro_index import meal_targets
+        nearest = state.macro_index.nearest(meal_targets(macros), 10)
+        return jsonify([recipe.to_dict() for recipe in nearest])
+
+    try:
+        return jsonify((await macro_candidates_async(macros))[:10])
+    except Exception as e:
+        return jsonify({"error": f"An error occurred during search: {e}"}), 500
+
+
+async def _verified_uid():
+    """
+    uid from the Bearer token, or None. Token verification may fetch Google's
+    signing keys, so it runs in a thread.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer ') or app.sync_app.auth is None:
+        return None
+    try:
+        decoded = await asyncio.to_thread(app.sync_app.auth.verify_id_token, auth_header.split(' ', 1)[1])
+    except Exception:
+        return None
+    return decoded.get('uid') or decoded.get('sub')
+
+
+async def generate_meal_plan_async(uid):
+    """
+    services.recommendations.generate_meal_plan on the async clients.
+    """
+    try:
+        user_doc = await app.db.collection('users').document(uid).get()
+        if not user_doc.exists:
+            return None
+        macros = (user_doc.to_dict() or {}).get('macros', {})
+
+        favorites = []
+        async for doc in app.db.collection('users').document(uid).collection('favorites').stream():
+            formatted = format_recipe_for_frontend(doc.to_dict(), recipe_id=doc.id)
+            if formatted:
+                favorites.append(formatted)
+
+        all_recipes, used_ids = favorite_pool(favorites)
+        fallbacks = await asyncio.gather(*(
+            fallback_recipes_async(macros, count, exclude_ids, meal_type)
+            for count, exclude_ids, meal_type in pool_requests(len(all_recipes), used_ids)
+        ))
+        for meal_fallbacks in fallbacks:
+            add_to_pool(all_recipes, used_ids, meal_fallbacks)
+        # CPU-bound but bounded by MEAL_PLAN_TIME_BUDGET_MS
+        return assemble_meal_plan(all_recipes, macros, {recipe["id"] for recipe in favorites})
+    except Exception as e:
+        print(f"Error generating meal plan: {e}")
+        return None
+
+
+@meal_plan.route("/", methods=["GET"])
+@shared_state
+async def get_meal_plan():
+    if app.db is None:
+        return jsonify({"error": "Firebase not initialized"}), 500
+
+    if not request.headers.get('Authorization', '').startswith('Bearer '):
+        return jsonify({"error": "Missing Authorization token"}), 401
+    uid = await _verified_uid()
+    if not uid:
+        return jsonify({"error": "Invalid auth token"}), 401
+
+    try:
+        current_week_start = get_current_week_start()
+        doc_ref = app.db.collection('users').document(uid).collection('meal_plan').document('current')
+        doc = await doc_ref.get()
+        if not doc.exists:
+            return jsonify({"error": "No meal plan found"}), 404
+
+        plan_data = doc.to_dict()
+        if plan_data.get('week_start') == current_week_start:
+            return jsonify(plan_data)
+
+        # New week: promote the pre-generated plan, or generate and save a fresh one
+        next_doc = await app.db.collection('users').document(uid).collection('meal_plan').document(NEXT_PLAN).get()
+        next_data = (next_doc.to_dict() or {}) if next_doc.exists else {}
+        plan = next_data.get('plan') if next_data.get('week_start') == current_week_start else None
+        plan = plan or await generate_meal_plan_async(uid)
+        if not plan:
+            return jsonify({"error": "Failed to generate meal plan"}), 500
+        await doc_ref.set({"week_start": current_week_start, "plan": plan}, merge=False)
+        return jsonify({"week_start": current_week_start, "plan": plan})
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to retrieve meal plan: {e}"}), 500
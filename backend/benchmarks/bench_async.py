@@ -0,0 +1,134 @@
+"""
+Benchmark concurrent-request throughput: the Flask app on a pool of worker
+threads (how it runs under a threaded WSGI server) vs the ASGI app on one
+event loop. Elasticsearch and Firestore are the in-process fakes from
+benchmarks.fakes with a fixed per-call latency standing in for the network.
+The search and candidate caches are on, as in the default config, with the
+alias re-checked every --alias-check seconds; they are cleared between the two
+runs. --no-cache turns them off so every request reaches the fakes.
+
+Run from backend/:
+    python -m benchmarks.bench_async
+    python -m benchmarks.bench_async --requests 2000 --concurrency 200 --latency 0.02
+    python -m benchmarks.bench_async --no-cache
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app as create_sync_app
+from async_app import create_app as create_async_app
+from benchmarks.fakes import AsyncFakeElasticsearch, AsyncFakeFirestore, load_catalog, seed_users, use_fakes
+from config import Config
+
+USERS = 200
+QUERIES = ["chicken", "pasta", "chocolate cake", "salad", "beef stew", "soup", "rice", "apple"]
+
+
+def bench_config(args):
+    class BenchConfig(Config):
+        SEARCH_BACKEND = "elasticsearch"
+        MACRO_INDEX = False
+        SEARCH_CACHE_SIZE = 0 if args.no_cache else Config.SEARCH_CACHE_SIZE
+        CANDIDATE_CACHE_SIZE = 0 if args.no_cache else Config.CANDIDATE_CACHE_SIZE
+        SEARCH_CACHE_ALIAS_CHECK = args.alias_check
+    return BenchConfig
+
+
+def clear_caches(app):
+    for cache in (app.search_cache, app.candidate_cache):
+        if cache is not None:
+            cache.clear()
+    app.candidate_sources.clear()
+
+
+def request_paths(count):
+    """
+    Alternate searches and recommendations so both the ES-only and the
+    Firestore + ES paths are in the mix.
+    """
+    paths = []
+    for n in range(count):
+        if n % 2:
+            paths.append(f"/api/recommendations/user-{n % USERS}")
+        else:
+            paths.append(f"/api/search?q={QUERIES[n % len(QUERIES)]}&size=10")
+    return paths
+
+
+def run_sync(app, paths, workers):
+    def fetch(path):
+        start = time.perf_counter()
+        response = app.test_client().get(path)
+        assert response.status_code == 200, (path, response.status_code, response.get_json())
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        latencies = list(pool.map(fetch, paths))
+    return time.perf_counter() - start, latencies
+
+
+async def run_async(app, paths, concurrency):
+    # test_app runs the startup hooks, which start the alias watch
+    async with app.test_app() as test_app:
+        return await _run_async(test_app.test_client(), paths, concurrency)
+
+
+async def _run_async(client, paths, concurrency):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def fetch(path):
+        async with gate:
+            start = time.perf_counter()
+            response = await client.get(path)
+            assert response.status_code == 200, (path, response.status_code, await response.get_json())
+            return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(fetch(path) for path in paths))
+    return time.perf_counter() - start, latencies
+
+
+def report(label, wall, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{label:<22} requests={len(latencies):>6,}  {len(latencies) / wall:8.1f} req/s  "
+        f"p50={p50 * 1000:7.1f}ms  p95={p95 * 1000:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="data/recipes.csv")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100, help="requests in flight on the async app")
+    parser.add_argument("--workers", type=int, default=16, help="threads serving the Flask app")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per fake ES/Firestore call")
+    parser.add_argument("--alias-check", type=float, default=0.5,
+                        help="seconds between alias checks of the caches (SEARCH_CACHE_ALIAS_CHECK)")
+    parser.add_argument("--no-cache", action="store_true", help="turn the search and candidate caches off")
+    args = parser.parse_args()
+    config = bench_config(args)
+
+    recipes = load_catalog(args.csv)
+    docs = seed_users(USERS, recipes)
+    paths = request_paths(args.requests)
+
+    flask_app = use_fakes(create_sync_app(config), recipes, docs, args.latency)
+    report(f"flask ({args.workers} threads)", *run_sync(flask_app, paths, args.workers))
+
+    clear_caches(flask_app)
+    asgi = create_async_app(
+        config, sync_app=flask_app,
+        es=AsyncFakeElasticsearch(recipes, args.latency), db=AsyncFakeFirestore(docs, args.latency),
+    )
+    report(f"asgi ({args.concurrency} in flight)", *asyncio.run(run_async(asgi.async_app, paths, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
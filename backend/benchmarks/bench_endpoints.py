@@ -0,0 +1,228 @@
+"""
+Latency and throughput of the search, recommendation and meal-plan routes,
+driven through the Flask test client against the in-process Elasticsearch and
+Firestore fakes (benchmarks.fakes) seeded from the recipes CSV. Each endpoint
+gets a warmup, then --requests timed calls one after another; the report has
+p50/p95/p99 latency and requests/sec per endpoint and is saved as JSON so two
+runs can be diffed.
+
+Run from backend/:
+    python -m benchmarks.bench_endpoints
+    python -m benchmarks.bench_endpoints --only search --requests 1000
+    python -m benchmarks.bench_endpoints --macro-index --compare benchmarks/results/endpoints-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app import create_app
+from benchmarks.fakes import load_catalog, seed_plans, seed_users, use_fakes
+from config import Config
+from services.meal_planner import DAYS, MEALS
+from services.pregenerate_plans import NEXT_PLAN
+from utils.dates import get_current_week_start
+
+USERS = 200
+QUERIES = ["chicken", "pasta", "chocolate cake", "salad", "beef stew", "soup", "rice", "apple pie"]
+PREFIXES = ["ch", "pas", "sal", "be", "so", "ri", "app", "co"]
+METRICS = ["req_per_s", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def _auth(uid):
+    return {"Authorization": f"Bearer {uid}"}
+
+
+def _user(n):
+    return f"user-{n % USERS}"
+
+
+def _stale_plan(app, uid):
+    """
+    Setup for the rollover case: the saved plan is from an earlier week.
+    """
+    doc = app.db.docs[("users", uid, "meal_plan", "current")]
+    app.db.docs[("users", uid, "meal_plan", "current")] = {**doc, "week_start": "2000-01-03"}
+
+
+def _pregenerated_plan(app, uid):
+    """
+    Setup for the promotion case: the saved plan is stale and next week's was
+    pre-generated (services.pregenerate_plans) for the current week.
+    """
+    _stale_plan(app, uid)
+    doc = app.db.docs[("users", uid, "meal_plan", "current")]
+    app.db.docs[("users", uid, "meal_plan", NEXT_PLAN)] = {**doc, "week_start": get_current_week_start()}
+
+
+def endpoints(app):
+    """
+    name -> function(n) returning the n-th request: (method, path, kwargs, setup or None).
+    setup runs untimed before the request.
+    """
+    client = app.test_client()
+
+    def next_page_path(n):
+        path = f"/api/search?q={QUERIES[n % len(QUERIES)]}&size=10"
+        cursor = client.get(path).get_json().get("next_cursor")
+        return f"{path}&cursor={cursor}" if cursor else path
+
+    second_pages = [next_page_path(n) for n in range(len(QUERIES))]
+
+    return {
+        "search": lambda n: ("GET", f"/api/search?q={QUERIES[n % len(QUERIES)]}&size=10", {}, None),
+        "search_filtered": lambda n: (
+            "GET", f"/api/search?q={QUERIES[n % len(QUERIES)]}&min_protein=10&max_calories=700"
+                   f"&max_total_time=60&size=10", {}, None,
+        ),
+        "search_facets": lambda n: ("GET", f"/api/search?q={QUERIES[n % len(QUERIES)]}&facets=1", {}, None),
+        "search_next_page": lambda n: ("GET", second_pages[n % len(second_pages)], {}, None),
+        "autocomplete": lambda n: ("GET", f"/api/autocomplete?q={PREFIXES[n % len(PREFIXES)]}", {}, None),
+        "recommendations": lambda n: ("GET", f"/api/recommendations/{_user(n)}", {}, None),
+        "meal_plan_get": lambda n: ("GET", "/meal-plan/", {"headers": _auth(_user(n))}, None),
+        "meal_plan_rollover": lambda n: (
+            "GET", "/meal-plan/", {"headers": _auth(_user(n))}, lambda: _stale_plan(app, _user(n)),
+        ),
+        "meal_plan_promote": lambda n: (
+            "GET", "/meal-plan/", {"headers": _auth(_user(n))}, lambda: _pregenerated_plan(app, _user(n)),
+        ),
+        "meal_plan_generate": lambda n: ("POST", "/meal-plan/generate", {"headers": _auth(_user(n))}, None),
+        "replacements": lambda n: (
+            "POST", "/meal-plan/replacements",
+            {"headers": _auth(_user(n)), "json": {"day": DAYS[n % 7], "meal": MEALS[n % 3]}}, None,
+        ),
+        "replacements_batch": lambda n: (
+            "POST", "/meal-plan/replacements/batch",
+            {"headers": _auth(_user(n)), "json": {"slots": [{"day": d, "meal": m} for d in DAYS for m in MEALS]}},
+            None,
+        ),
+    }
+
+
+def run_endpoint(client, make_request, requests, warmup):
+    for n in range(warmup):
+        method, path, kwargs, setup = make_request(n)
+        if setup:
+            setup()
+        client.open(path, method=method, **kwargs)
+
+    latencies, errors, busy = [], 0, 0.0
+    for n in range(warmup, warmup + requests):
+        method, path, kwargs, setup = make_request(n)
+        if setup:
+            setup()
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        busy += elapsed
+        latencies.append(elapsed)
+        if response.status_code >= 400:
+            errors += 1
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "requests": requests,
+        "errors": errors,
+        "req_per_s": round(requests / busy, 1),
+        "mean_ms": round(busy / requests * 1000, 3),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_config(args):
+    class BenchConfig(Config):
+        SEARCH_BACKEND = args.backend
+        MACRO_INDEX = args.macro_index
+        SEARCH_CACHE_SIZE = Config.SEARCH_CACHE_SIZE if args.cache else 0
+        CANDIDATE_CACHE_SIZE = Config.CANDIDATE_CACHE_SIZE if args.cache else 0
+    return BenchConfig
+
+
+def print_report(results, baseline=None):
+    print(f"{'endpoint':<20} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        print(
+            f"{name:<20} {result['req_per_s']:>9.1f} {result['p50_ms']:>9.2f} "
+            f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}"
+        )
+        before = (baseline or {}).get(name)
+        if before:
+            changes = "  ".join(
+                f"{metric} {(result[metric] - before[metric]) / before[metric] * 100:+.1f}%"
+                for metric in METRICS if before.get(metric)
+            )
+            print(f"{'':<20} vs baseline: {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="data/recipes.csv")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", action="append", help="endpoints whose name starts with this (repeatable)")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to each fake ES/Firestore call (default: none, app time only)")
+    parser.add_argument("--backend", default="elasticsearch", choices=["elasticsearch", "local"],
+                        help="SEARCH_BACKEND for /api/search")
+    parser.add_argument("--macro-index", action="store_true", help="serve recommendations from the macro index")
+    parser.add_argument("--cache", action="store_true", help="keep the search and candidate caches on")
+    parser.add_argument("--no-templates", action="store_true", help="send rendered bodies, not search templates")
+    parser.add_argument("--output", help="results file (default benchmarks/results/endpoints-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to show changes against")
+    args = parser.parse_args()
+
+    recipes = load_catalog(args.csv)
+    docs = seed_plans(seed_users(USERS, recipes), recipes, get_current_week_start())
+    app = use_fakes(create_app(bench_config(args)), recipes, docs, args.latency)
+    app.search_templates = not args.no_templates
+
+    client = app.test_client()
+    results = {}
+    for name, make_request in endpoints(app).items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        results[name] = run_endpoint(client, make_request, args.requests, args.warmup)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+    print_report(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join("benchmarks", "results", f"endpoints-{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "commit": commit,
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "recipes": len(recipes),
+            "settings": {
+                "requests": args.requests, "warmup": args.warmup, "latency": args.latency,
+                "backend": args.backend, "macro_index": args.macro_index, "cache": args.cache,
+                "templates": not args.no_templates,
+            },
+            "endpoints": results,
+        }, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark nutrition extraction: the old per-nutrient .apply() passes vs the
+single-pass extractor in data_processing.
+
+Run from backend/:
+    python -m benchmarks.bench_nutrition
+    python -m benchmarks.bench_nutrition --rows 1000000
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_processing import NUTRIENTS, calc_calories, extract_nutrients
+
+
+def legacy_extract(df):
+    """The original implementation: one .apply() per nutrient plus row-wise calories."""
+    def extract_nutrient(nutrition_str, nutrient_name, unit='g'):
+        if not isinstance(nutrition_str, str):
+            return None
+        pattern = rf"{nutrient_name}\s+(\d+\.?\d*){unit}"
+        match = re.search(pattern, nutrition_str, re.IGNORECASE)
+        if match:
+            return float(match.group(1))
+        return None
+
+    df = df.copy()
+    for column, (label, unit) in NUTRIENTS.items():
+        df[column] = df['nutrition'].apply(lambda x: extract_nutrient(x, label, unit))
+
+    def calc_row(row):
+        try:
+            fat = float(row.get('fat_grams', 0) or 0)
+            carbs = float(row.get('carbs_grams', 0) or 0)
+            protein = float(row.get('protein_grams', 0) or 0)
+            return round(fat * 9 + carbs * 4 + protein * 4)
+        except Exception:
+            return ""
+    df['calories'] = df.apply(calc_row, axis=1)
+    return df
+
+
+def vectorized_extract(df):
+    df = pd.concat([df, extract_nutrients(df['nutrition'])], axis=1)
+    df['calories'] = calc_calories(df)
+    return df
+
+
+def synthetic_corpus(source, rows, seed=0):
+    """
+    Build a corpus of `rows` nutrition strings by re-sampling the real ones and
+    jittering every number, so the regex work matches real data.
+    """
+    rng = np.random.default_rng(seed)
+    templates = source['nutrition'].dropna().str.replace(r"\d+", "{}", regex=True).unique()
+    picked = rng.choice(templates, size=rows)
+    numbers = rng.integers(0, 500, size=(rows, 24))
+    nutrition = [t.format(*n[:t.count("{}")]) for t, n in zip(picked, numbers)]
+    return pd.DataFrame({'nutrition': nutrition})
+
+
+def timed(fn, df, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(label, df, repeat, skip_legacy):
+    vectorized = timed(vectorized_extract, df, repeat)
+    if skip_legacy:
+        print(f"{label:<22} rows={len(df):>9,}  vectorized={vectorized:8.3f}s")
+        return
+    legacy = timed(legacy_extract, df, repeat)
+    print(
+        f"{label:<22} rows={len(df):>9,}  legacy={legacy:8.3f}s  "
+        f"vectorized={vectorized:8.3f}s  speedup={legacy / vectorized:5.1f}x"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="data/recipes.csv")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="size of the synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy", action="store_true", help="only time the vectorized parser")
+    args = parser.parse_args()
+
+    source = pd.read_csv(args.csv)
+    report("recipes.csv", source, args.repeat, args.skip_legacy)
+
+    corpus = synthetic_corpus(source, args.rows)
+    report("synthetic", corpus, 1, args.skip_legacy)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""
+In-process stand-ins for Elasticsearch and Firestore, seeded from the recipe
+catalog, for benchmarks that exercise the routes without a cluster or a
+Firebase project. Each call sleeps for `latency` seconds (time.sleep in the
+sync fakes, asyncio.sleep in the async ones) to model the network round trip.
+
+They understand just the queries the app sends: bool queries with
+multi_match/range/terms, function_score over the macro fields, completion
+suggestions, ids lookups, mget and msearch, plus the stored search templates
+(rendered with services.query_builder). Search results are memoized per
+request body: the scan stands in for work the cluster does, and shouldn't
+eat the CPU time the benchmark is measuring.
+"""
+import asyncio
+import json
+import math
+import time
+
+import numpy as np
+
+from data_processing import load_and_process_recipes
+from services.query_builder import render
+
+GAUSS_DECAY = 0.5
+
+
+# Hits report this versioned build of the alias as their index, like a
+# cluster after services.elastic's alias swap
+FAKE_ALIAS = "recipes"
+FAKE_BUILD = f"{FAKE_ALIAS}-20250101000000"
+
+
+def _tokens(text):
+    return set(str(text).lower().split())
+
+
+class FakeSearchIndex:
+    """
+    Query evaluation shared by the sync and async Elasticsearch fakes.
+    """
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.by_id = {recipe["id"]: recipe for recipe in recipes}
+        self.text = [_tokens(f"{r.get('name', '')} {r.get('ingredients', '')}") for r in recipes]
+        self.results = {}
+        self.columns = {}
+        self.ids = np.array([recipe["id"] for recipe in recipes])
+        # Position of each id in sorted order, the sort tiebreaker
+        self.id_rank = np.argsort(np.argsort(self.ids))
+
+    def _column(self, field):
+        if field not in self.columns:
+            self.columns[field] = np.array([
+                np.nan if r.get(field) in ("", None) else float(r[field]) for r in self.recipes
+            ])
+        return self.columns[field]
+
+    def _mask(self, clause):
+        """
+        Boolean array of the recipes matching a query clause.
+        """
+        if "match_all" in clause:
+            return np.ones(len(self.recipes), dtype=bool)
+        if "multi_match" in clause:
+            terms = _tokens(clause["multi_match"]["query"])
+            return np.array([bool(terms & text) for text in self.text], dtype=bool)
+        if "range" in clause:
+            (field, bounds), = clause["range"].items()
+            column = self._column(field)
+            with np.errstate(invalid="ignore"):
+                return (column >= bounds.get("gte", -math.inf)) & (column <= bounds.get("lte", math.inf))
+        if "term" in clause:
+            (field, value), = clause["term"].items()
+            return np.array([
+                value in r[field] if isinstance(r.get(field), list) else value == r.get(field)
+                for r in self.recipes
+            ], dtype=bool)
+        if "terms" in clause:
+            (field, values), = clause["terms"].items()
+            values = set(values)
+            return np.array([bool(values & set(r.get(field) or [])) for r in self.recipes], dtype=bool)
+        if "ids" in clause:
+            return np.isin(self.ids, list(clause["ids"]["values"]))
+        if "bool" in clause:
+            bool_query = clause["bool"]
+            mask = np.ones(len(self.recipes), dtype=bool)
+            for c in bool_query.get("must", []) + bool_query.get("filter", []):
+                mask &= self._mask(c)
+            for c in bool_query.get("must_not", []):
+                mask &= ~self._mask(c)
+            return mask
+        return np.ones(len(self.recipes), dtype=bool)
+
+    def _gauss(self, functions):
+        """
+        Product of the gauss decay scores for every recipe; a missing value scores 1.
+        """
+        scores = np.ones(len(self.recipes))
+        for function in functions:
+            (field, params), = function["gauss"].items()
+            sigma2 = -params["scale"] ** 2 / (2 * math.log(GAUSS_DECAY))
+            distance = np.maximum(0.0, np.abs(self._column(field) - params["origin"]) - params.get("offset", 0))
+            scores *= np.nan_to_num(np.exp(-distance ** 2 / (2 * sigma2)), nan=1.0)
+        return scores
+
+    def _project(self, recipe, source):
+        if isinstance(source, list):
+            return {field: recipe[field] for field in source if field in recipe}
+        return recipe
+
+    def search(self, index, body):
+        key = (index, json.dumps(body, sort_keys=True, default=str))
+        if key not in self.results:
+            self.results[key] = self._search(index, body)
+        return self.results[key]
+
+    def _search(self, index, body):
+        if "suggest" in body:
+            (name, suggest), = body["suggest"].items()
+            prefix = suggest["prefix"].lower()
+            options = [
+                {"_source": self._project(r, body.get("_source"))}
+                for r in self.recipes if str(r.get("name", "")).lower().startswith(prefix)
+            ][:suggest["completion"].get("size", 5)]
+            return {"hits": {"hits": []}, "suggest": {name: [{"options": options}]}}
+
+        query = body.get("query", {"match_all": {}})
+        functions = None
+        if "function_score" in query:
+            functions = query["function_score"]["functions"]
+            query = query["function_score"]["query"]
+
+        scores = self._gauss(functions) if functions else np.ones(len(self.recipes))
+        mask = self._mask(query)
+        after = body.get("search_after")
+        if after:
+            # Past (score, id) in (score desc, id asc) order
+            mask &= (scores < after[0]) | ((scores == after[0]) & (self.ids > after[1]))
+        rows = np.flatnonzero(mask)
+        rows = rows[np.lexsort((self.id_rank[rows], -scores[rows]))]
+
+        hits = [
+            {"_index": index if index.startswith(f"{FAKE_ALIAS}-") else FAKE_BUILD, "_id": self.recipes[i]["id"], "_score": float(scores[i]),
+             "_source": self._project(self.recipes[i], body.get("_source")),
+             "sort": [float(scores[i]), self.recipes[i]["id"]]}
+            for i in rows[:body.get("size", 10)]
+        ]
+        return {"hits": {"total": {"value": int(mask.sum())}, "hits": hits}}
+
+    def mget(self, index, ids):
+        return {"docs": [
+            {"_id": i, "found": i in self.by_id, **({"_source": self.by_id[i]} if i in self.by_id else {})}
+            for i in ids
+        ]}
+
+    def msearch(self, index, searches):
+        return {"responses": [self.search(index, body) for body in searches[1::2]]}
+
+    def search_template(self, index, id, params):
+        return self.search(index, render(id, params))
+
+    def msearch_template(self, index, search_templates):
+        return {"responses": [
+            self.search_template(index, **search) for search in search_templates[1::2]
+        ]}
+
+
+class FakeIndices:
+    """
+    client.indices, as far as alias checks go: FAKE_ALIAS points at FAKE_BUILD.
+    """
+
+    def __init__(self, es):
+        self.es = es
+
+    def exists_alias(self, name):
+        self.es._wait()
+        return name == FAKE_ALIAS
+
+    def get_alias(self, name):
+        self.es._wait()
+        return {FAKE_BUILD: {"aliases": {FAKE_ALIAS: {}}}}
+
+
+class AsyncFakeIndices(FakeIndices):
+    async def exists_alias(self, name):
+        await self.es._wait()
+        return name == FAKE_ALIAS
+
+    async def get_alias(self, name):
+        await self.es._wait()
+        return {FAKE_BUILD: {"aliases": {FAKE_ALIAS: {}}}}
+
+
+class FakeElasticsearch:
+    indices_class = FakeIndices
+
+    def __init__(self, recipes, latency=0.0):
+        self.index = FakeSearchIndex(recipes)
+        self.indices = self.indices_class(self)
+        self.latency = latency
+        self.calls = 0
+
+    def _wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def ping(self):
+        return True
+
+    def search(self, index, body):
+        self._wait()
+        return self.index.search(index, body)
+
+    def mget(self, index, ids):
+        self._wait()
+        return self.index.mget(index, ids)
+
+    def msearch(self, index, searches):
+        self._wait()
+        return self.index.msearch(index, searches)
+
+    def search_template(self, index, id, params):
+        self._wait()
+        return self.index.search_template(index, id, params)
+
+    def msearch_template(self, index, search_templates):
+        self._wait()
+        return self.index.msearch_template(index, search_templates)
+
+
+class AsyncFakeElasticsearch(FakeElasticsearch):
+    indices_class = AsyncFakeIndices
+
+    async def _wait(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def ping(self):
+        return True
+
+    async def search(self, index, body):
+        await self._wait()
+        return self.index.search(index, body)
+
+    async def mget(self, index, ids):
+        await self._wait()
+        return self.index.mget(index, ids)
+
+    async def msearch(self, index, searches):
+        await self._wait()
+        return self.index.msearch(index, searches)
+
+    async def search_template(self, index, id, params):
+        await self._wait()
+        return self.index.search_template(index, id, params)
+
+    async def msearch_template(self, index, search_templates):
+        await self._wait()
+        return self.index.msearch_template(index, search_templates)
+
+    async def close(self):
+        pass
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self._path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return FakeCollection(self._store, self._path + (name,))
+
+    def get(self):
+        self._store.wait()
+        return FakeSnapshot(self.id, self._store.docs.get(self._path))
+
+    def set(self, data, merge=False):
+        self._store.wait()
+        self._write(data, merge)
+
+    def _write(self, data, merge):
+        if merge and self._path in self._store.docs:
+            self._store.docs[self._path] = {**self._store.docs[self._path], **data}
+        else:
+            self._store.docs[self._path] = dict(data)
+
+    def delete(self):
+        self._store.wait()
+        self._store.docs.pop(self._path, None)
+
+
+class FakeCollection:
+    def __init__(self, store, path):
+        self._store = store
+        self._path = path
+
+    def document(self, doc_id):
+        return FakeDocument(self._store, self._path + (doc_id,))
+
+    def stream(self):
+        self._store.wait()
+        return [
+            FakeSnapshot(path[-1], data) for path, data in list(self._store.docs.items())
+            if path[:-1] == self._path
+        ]
+
+
+class FakeBatch:
+    """
+    WriteBatch stand-in: sets are applied together, in one call, on commit.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._writes = []
+
+    def set(self, ref, data, merge=False):
+        self._writes.append((ref, data, merge))
+
+    def commit(self):
+        self._store.wait()
+        for ref, data, merge in self._writes:
+            ref._write(data, merge)
+
+
+class FakeFirestore:
+    """
+    Firestore client over a dict of document path tuples -> data.
+    """
+
+    def __init__(self, docs=None, latency=0.0):
+        self.docs = docs if docs is not None else {}
+        self.latency = latency
+        self.calls = 0
+
+    def wait(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def collection(self, name):
+        return FakeCollection(self, (name,))
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class AsyncFakeDocument(FakeDocument):
+    def collection(self, name):
+        return AsyncFakeCollection(self._store, self._path + (name,))
+
+    async def get(self):
+        await self._store.wait()
+        return FakeSnapshot(self.id, self._store.docs.get(self._path))
+
+    async def set(self, data, merge=False):
+        await self._store.wait()
+        self._write(data, merge)
+
+
+class AsyncFakeCollection(FakeCollection):
+    def document(self, doc_id):
+        return AsyncFakeDocument(self._store, self._path + (doc_id,))
+
+    async def stream(self):
+        await self._store.wait()
+        for path, data in list(self._store.docs.items()):
+            if path[:-1] == self._path:
+                yield FakeSnapshot(path[-1], data)
+
+
+class AsyncFakeFirestore(FakeFirestore):
+    async def wait(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def collection(self, name):
+        return AsyncFakeCollection(self, (name,))
+
+
+class FakeAuth:
+    """
+    firebase_admin.auth stand-in: a token is the uid it authenticates.
+    """
+
+    @staticmethod
+    def verify_id_token(token):
+        return {"uid": token}
+
+
+def seed_users(count, recipes, favorites_per_user=5):
+    """
+    Firestore documents for `count` users with varied macro targets, a few
+    favorites each and no saved plan.
+    """
+    docs = {}
+    for n in range(count):
+        uid = f"user-{n}"
+        docs[("users", uid)] = {"macros": {
+            "calories": 1600 + (n * 37) % 1400,
+            "protein": 60 + (n * 11) % 140,
+            "carbs": 150 + (n * 23) % 200,
+            "fat": 45 + (n * 7) % 60,
+        }}
+        for k in range(favorites_per_user):
+            recipe = recipes[(n * favorites_per_user + k) % len(recipes)]
+            docs[("users", uid, "favorites", recipe["id"])] = recipe
+    return docs
+
+
+def seed_plans(docs, recipes, week_start, users=None):
+    """
+    Give each seeded user (or just `users`) a saved plan for week_start,
+    built from consecutive catalog recipes.
+    """
+    from services.meal_planner import DAYS, MEALS
+    from utils.formatters import format_recipe_for_frontend
+
+    uids = users if users is not None else [path[1] for path in docs if len(path) == 2 and path[0] == "users"]
+    for n, uid in enumerate(uids):
+        pool = iter(format_recipe_for_frontend(recipes[(n * 21 + k) % len(recipes)]) for k in range(21))
+        plan = {day: {meal: next(pool) for meal in MEALS} for day in DAYS}
+        docs[("users", uid, "meal_plan", "current")] = {"week_start": week_start, "plan": plan}
+    return docs
+
+
+def use_fakes(app, recipes, docs, latency=0.0):
+    """
+    Point a Flask app built by app.create_app at the sync fakes. The response
+    caches are rebuilt so their alias checks go to the fake client too.
+    """
+    from extensions import init_candidate_cache, init_search_cache
+
+    app.client = FakeElasticsearch(recipes, latency)
+    app.INDEX_NAME = FAKE_ALIAS
+    app.db = FakeFirestore(docs, latency)
+    app.auth = FakeAuth()
+    init_search_cache(app)
+    init_candidate_cache(app)
+    return app
+
+
+def load_catalog(csv_path="data/recipes.csv"):
+    return load_and_process_recipes(csv_path)
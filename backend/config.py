@@ -1,8 +1,65 @@
 import os
 
+DEFAULT_MEAL_SPLITS = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.4}
+
+
+def parse_meal_splits(value):
+    """
+    MEAL_SPLITS ("breakfast=0.25,lunch=0.35,dinner=0.4") as a dict. Every meal
+    needs a positive share and the shares must sum to 1 (within 0.01); anything
+    else falls back to DEFAULT_MEAL_SPLITS with a warning, so a bad value can't
+    stop the app from starting.
+    """
+    if not value:
+        return dict(DEFAULT_MEAL_SPLITS)
+    try:
+        splits = {}
+        for item in value.split(","):
+            meal, share = item.split("=")
+            splits[meal.strip().lower()] = float(share)
+        if set(splits) != set(DEFAULT_MEAL_SPLITS):
+            raise ValueError(f"expected shares for {', '.join(DEFAULT_MEAL_SPLITS)}")
+        if not all(share > 0 for share in splits.values()):
+            raise ValueError("shares must be positive")
+        if not abs(sum(splits.values()) - 1) <= 0.01:
+            raise ValueError("shares must sum to 1")
+    except ValueError as e:
+        print(f"Warning: invalid MEAL_SPLITS {value!r} ({e}), using the defaults")
+        return dict(DEFAULT_MEAL_SPLITS)
+    return splits
+
+
 class Config:
     DEBUG = os.getenv("FLASK_DEBUG", "False").lower() in ("1", "true", "yes")
     ES_HOST = os.getenv("ES_HOST", "http://localhost:9200")
     ES_INDEX = os.getenv("ES_INDEX", "recipes")
     FIREBASE_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
+    # "elasticsearch", "local" (in-process index, no ES needed for /api/search),
+    # or "auto" (local only when Elasticsearch is unavailable)
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "elasticsearch").lower()
+    # Answer recommendations and meal-plan fallbacks from an in-process macro
+    # index instead of a function_score query
+    MACRO_INDEX = os.getenv("MACRO_INDEX", "False").lower() in ("1", "true", "yes")
+    # /api/search response cache; size 0 turns it off. The alias is re-checked
+    # every SEARCH_CACHE_ALIAS_CHECK seconds and a swap clears the cache.
+    SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))
+    SEARCH_CACHE_ALIAS_CHECK = float(os.getenv("SEARCH_CACHE_ALIAS_CHECK", "10"))
+    # Recommendation candidates are cached per macro bucket: per-meal targets
+    # are rounded to these steps so similar users share one ranked list
+    CANDIDATE_CACHE_SIZE = int(os.getenv("CANDIDATE_CACHE_SIZE", "4096"))
+    CANDIDATE_CACHE_TTL = float(os.getenv("CANDIDATE_CACHE_TTL", "600"))
+    CANDIDATE_POOL_SIZE = int(os.getenv("CANDIDATE_POOL_SIZE", "100"))
+    MACRO_BUCKET_CALORIES = float(os.getenv("MACRO_BUCKET_CALORIES", "50"))
+    MACRO_BUCKET_GRAMS = float(os.getenv("MACRO_BUCKET_GRAMS", "5"))
+    # Send search-template ids and params instead of full query bodies; missing
+    # templates are stored at startup (see services/query_builder.py)
+    SEARCH_TEMPLATES = os.getenv("SEARCH_TEMPLATES", "True").lower() in ("1", "true", "yes")
+    # Weekly plan optimizer (services/meal_planner.py): recipes gathered per
+    # plan, time budget per plan, and cost credit for each favorite used
+    MEAL_PLAN_POOL_SIZE = int(os.getenv("MEAL_PLAN_POOL_SIZE", "60"))
+    MEAL_PLAN_TIME_BUDGET_MS = float(os.getenv("MEAL_PLAN_TIME_BUDGET_MS", "50"))
+    MEAL_PLAN_FAVORITE_BONUS = float(os.getenv("MEAL_PLAN_FAVORITE_BONUS", "0.25"))
+    # Share of the daily macros each meal aims for, "meal=share,..." summing to 1
+    MEAL_SPLITS = parse_meal_splits(os.getenv("MEAL_SPLITS"))
@@ -1,59 +1,411 @@
+import hashlib
+import json
+import os
 import pandas as pd
 import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from utils.catalog_cache import cache_key, load_frame, save_frame
+from utils.formatters import parse_ingredient, recipe_id_for, split_directions, split_ingredients
 
-def load_and_process_recipes():
+RECIPES_CSV = "data/recipes.csv"
+CHUNK_SIZE = 5000
+
+# Read as text regardless of content, so every chunk of a large CSV gets the same dtypes
+TEXT_COLUMNS = [
+    'recipe_name', 'prep_time', 'cook_time', 'total_time', 'yield', 'ingredients',
+    'directions', 'url', 'cuisine_path', 'nutrition', 'timing', 'img_src',
+]
+CACHE_DIR = os.getenv("CATALOG_CACHE_DIR", "data/.cache")
+
+# Source files whose changes invalidate the processed catalog cache
+CODE_FILES = [
+    __file__,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "catalog_cache.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "formatters.py"),
+]
+
+# Output column -> (label in the nutrition string, unit), in the order the
+# nutrition panel lists them
+NUTRIENTS = {
+    'fat_grams': ('Total Fat', 'g'),
+    'saturated_fat_grams': ('Saturated Fat', 'g'),
+    'cholesterol_mg': ('Cholesterol', 'mg'),
+    'sodium_mg': ('Sodium', 'mg'),
+    'carbs_grams': ('Total Carbohydrate', 'g'),
+    'fiber_grams': ('Dietary Fiber', 'g'),
+    'sugar_grams': ('Total Sugars', 'g'),
+    'protein_grams': ('Protein', 'g'),
+    'vitamin_c_mg': ('Vitamin C', 'mg'),
+    'calcium_mg': ('Calcium', 'mg'),
+    'iron_mg': ('Iron', 'mg'),
+    'potassium_mg': ('Potassium', 'mg'),
+}
+
+# One optional group per nutrient, in nutrition-panel order, so a single
+# str.extract pass pulls every nutrient out of each row
+NUTRIENT_PATTERN = "".join(
+    rf"(?:.*?{re.escape(label)}\s+(?P<{column}>\d+\.?\d*){unit})?"
+    for column, (label, unit) in NUTRIENTS.items()
+)
+
+
+# Display time column -> integer minutes column
+TIME_COLUMNS = {
+    'prep_time': 'prep_minutes',
+    'cook_time': 'cook_minutes',
+    'total_time': 'total_minutes',
+}
+# Meal types a recipe can fill, as stored in the meal_types keyword field
+MEAL_TYPES = ["breakfast", "lunch", "dinner"]
+
+# Matched as whole words (plurals too) against the cuisine path and recipe name
+def _words(*words):
+    return re.compile(rf"\b(?:{'|'.join(words)})(?:e?s)?\b", re.IGNORECASE)
+
+BREAKFAST_WORDS = _words(
+    "breakfast", "brunch", "pancake", "waffle", "french toast", "oatmeal", "overnight oats", "granola",
+    "muesli", "omelett?e", "frittata", "quiche", "scrambled", r"eggs? benedict", "muffin", "scone", "bagel",
+    "coffee cake", "crepe", "smoothie", "hash brown", "parfait", "cereal", "danish", "cinnamon roll",
+    "banana bread", "avocado toast")
+LUNCH_WORDS = _words(
+    "salad", "sandwich", "wrap", "soup", "chowder", "burger", "quesadilla", "panini", "pita", "toast",
+    "bisque", "bowl", "taco")
+DINNER_WORDS = _words(
+    "main dish", "meat and poultry", "seafood", "bbq", "grill(?:ed|ing)?", "roast(?:ed)?", "casserole",
+    "stew", "chili", "curry", "lasagna", "pasta", "risotto", "pizza", "meatloaf", "steak", "chop",
+    "salmon", "chicken", "beef", "pork", "ham", "turkey", "lamb", "shrimp", "fish", "stir.fry",
+    "enchilada", "pot pie", "noodle", "tagine")
+# Not a meal by themselves: sweets, drinks and condiments
+NOT_A_MEAL_WORDS = _words(
+    "dessert", "drink", "cocktail", "juice", "lemonade", "punch", "sauce", "condiment", "jam", "jelly",
+    "butter", "compote", "chutney", "glaze", "cake", "cupcake", "pie", "cobbler", "crisp", "tart",
+    "cookie", "candy", "fudge", "pudding", "ice cream", "sorbet", "trifle", "strudel", "fruit pizza",
+    "chip", "dip", "salsa", "guacamole", "bar", "mimosa", "sangria", "margarita", "martini", "mojito",
+    "milkshake")
+# Cuisine path sections that are never a meal, whatever the recipe's name
+# says ("Pear Vinaigrette" under Salad Dressing, "Orange Gelatin Salad" under
+# Desserts); drinks under Breakfast and Brunch (smoothies) are the exception
+NOT_A_MEAL_SECTIONS = _words("desserts?", "drinks?", "cocktails?", "condiments?", "salad dressings?")
+BREAKFAST_SECTION = re.compile(r"(?:^|/)Breakfast and Brunch(?:/|$)", re.IGNORECASE)
+# A main dish this light also works for lunch; a lunch dish this heavy for dinner
+LIGHT_MAIN_CALORIES = 600
+HEARTY_LUNCH_CALORIES = 400
+
+DURATION_PATTERN = r"(?:(?P<days>\d+)\s*days?)?\s*(?:(?P<hours>\d+)\s*hrs?)?\s*(?:(?P<mins>\d+)\s*mins?)?"
+
+
+def parse_minutes(times):
+    """
+    Convert a Series of durations like "1 hrs 20 mins" or "1 day 2 hrs" into
+    minutes (NaN when empty or unparseable).
+    """
+    parts = times.str.extract(DURATION_PATTERN, flags=re.IGNORECASE).astype(float)
+    minutes = (parts.fillna(0) * [24 * 60, 60, 1]).sum(axis=1)
+    return minutes.where(parts.notna().any(axis=1))
+
+
+def extract_nutrients(nutrition):
+    """
+    Parse every nutrient out of a Series of nutrition strings in one regex pass.
+    Returns a float DataFrame with one column per NUTRIENTS entry (NaN when missing).
+    """
+    return nutrition.str.extract(NUTRIENT_PATTERN, flags=re.IGNORECASE).astype(float)
+
+
+def calc_calories(df):
+    """
+    Calories from macros (9 kcal/g fat, 4 kcal/g carbs and protein).
+    A missing macro counts as 0; rows with no macros at all stay NaN.
+    """
+    macros = df[['fat_grams', 'carbs_grams', 'protein_grams']]
+    calories = (macros.fillna(0) * [9, 4, 4]).sum(axis=1).round()
+    return calories.where(macros.notna().any(axis=1))
+
+
+@contextmanager
+def timed_stage(timings, stage):
+    """
+    Add the wall time of the with-block to timings[stage] (a Counter), if given.
+    """
+    start = time.perf_counter()
     try:
-        df = pd.read_csv("data/recipes.csv")
-    except FileNotFoundError:
-        print("ERROR: 'recipes.csv' not found")
-        exit()
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] += time.perf_counter() - start
+
+
+def read_recipes_csv(csv_path=RECIPES_CSV, chunksize=None):
+    """
+    pd.read_csv with the recipe text columns pinned to str.
+    With chunksize, returns an iterator of DataFrames instead.
+    """
+    return pd.read_csv(csv_path, dtype={c: str for c in TEXT_COLUMNS}, chunksize=chunksize)
+
+
+_SUGGEST_STOPWORDS = {"a", "and", "by", "for", "in", "of", "on", "or", "the", "with"}
+
+
+def _normalize_ingredient(name):
+    name = name.split(" - ")[0]
+    name = re.sub(r"\([^)]*\)?", " ", name.lower())
+    name = re.sub(r"[^a-z\s-]", " ", name)
+    return " ".join(name.split())
+
+
+def suggest_inputs(name, ingredients_parsed):
+    """
+    Completion-suggester entries for a recipe: the name and every word-suffix
+    of it ("Butter Chicken", "Chicken"), weighted above its normalized
+    ingredient names, so prefixes of any of them find the recipe.
+    """
+    entries = []
+    if isinstance(name, str) and name.strip():
+        words = name.split()
+        suffixes = [
+            " ".join(words[i:]) for i in range(min(len(words), 4))
+            if i == 0 or words[i].lower() not in _SUGGEST_STOPWORDS
+        ]
+        entries.append({"input": suffixes, "weight": 10})
+
+    ingredients = []
+    for ingredient in ingredients_parsed:
+        # Lines without a quantity are mostly fragments like "peeled" or "chopped"
+        if ingredient["quantity"] is None or not ingredient["name"]:
+            continue
+        normalized = _normalize_ingredient(ingredient["name"])
+        if 2 < len(normalized) <= 50 and normalized not in ingredients:
+            ingredients.append(normalized)
+    if ingredients:
+        entries.append({"input": ingredients, "weight": 1})
+    return entries
+
+
+def cuisine_tokens(path):
+    """
+    Hierarchical facet tokens for a cuisine path:
+    "/Desserts/Pies/Apple Pie Recipes/" -> ["Desserts", "Desserts/Pies",
+    "Desserts/Pies/Apple Pie Recipes"], so filtering on any level matches
+    everything below it.
+    """
+    if not isinstance(path, str):
+        return []
+    parts = [part.strip() for part in path.split("/") if part.strip()]
+    return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+def meal_types(path, name, calories):
+    """
+    Meal slots a recipe suits, from its cuisine path, name and calories:
+    breakfast dishes by keyword; main dishes for dinner (and lunch when light);
+    salads, soups and sandwiches for lunch (and dinner when hearty). Desserts,
+    drinks and condiments suit none.
+    """
+    path = path if isinstance(path, str) else ""
+    name = name if isinstance(name, str) else ""
+    text = f"{path} {name}"
+    calories = calories if isinstance(calories, (int, float)) and calories == calories else 0
+    if NOT_A_MEAL_SECTIONS.search(path) and not BREAKFAST_SECTION.search(path):
+        return []
+
+    # Judge the dish, not its trimmings ("Lamb with Fig Sauce"), and don't let
+    # a breakfast name ("Coffee Cake") read as a dessert
+    dish = re.split(r"\bwith\b", name, maxsplit=1, flags=re.IGNORECASE)[0]
+    sweet = NOT_A_MEAL_WORDS.search(BREAKFAST_WORDS.sub("", dish))
+    if BREAKFAST_WORDS.search(text):
+        return [] if sweet else ["breakfast"]
+    types = []
+    if DINNER_WORDS.search(text):
+        types = ["dinner"] + (["lunch"] if calories <= LIGHT_MAIN_CALORIES else [])
+    elif LUNCH_WORDS.search(text):
+        types = ["lunch"] + (["dinner"] if calories >= HEARTY_LUNCH_CALORIES else [])
+    # A sweet or a sauce is excluded even under a main-course section
+    if sweet or (not types and NOT_A_MEAL_WORDS.search(path)):
+        return []
+    return [meal for meal in MEAL_TYPES if meal in types]
 
-    def extract_nutrient(nutrition_str, nutrient_name, unit='g'):
-        if not isinstance(nutrition_str, str):
-            return None
-        pattern = rf"{nutrient_name}\s+(\d+\.?\d*){unit}"
-        match = re.search(pattern, nutrition_str, re.IGNORECASE)
-        if match:
-            return float(match.group(1))
-        return None
-    
-    df['fat_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Total Fat'))
-    df['saturated_fat_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Saturated Fat'))
-    df['cholesterol_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Cholesterol', 'mg'))
-    df['sodium_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Sodium', 'mg'))
-    df['carbs_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Total Carbohydrate'))
-    df['fiber_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Dietary Fiber'))
-    df['sugar_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Total Sugars'))
-    df['protein_grams'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Protein'))
-    df['vitamin_c_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Vitamin C', 'mg'))
-    df['calcium_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Calcium', 'mg'))
-    df['iron_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Iron', 'mg'))
-    df['potassium_mg'] = df['nutrition'].apply(lambda x: extract_nutrient(x, 'Potassium', 'mg'))
-    
-    df = df.rename(columns={'recipe_name': 'name'})
-
-    # Calculate calories
-    def calc_calories(row):
-        try:
-            fat = float(row.get('fat_grams', 0) or 0)
-            carbs = float(row.get('carbs_grams', 0) or 0)
-            protein = float(row.get('protein_grams', 0) or 0)
-            return round(fat * 9 + carbs * 4 + protein * 4)
-        except Exception:
-            return ""
-    df['calories'] = df.apply(calc_calories, axis=1)
 
-    if 'Unnamed: 0' in df.columns:
-        df = df.drop(columns=['Unnamed: 0'])
+def process_recipes(df, timings=None):
+    """
+    Clean a raw recipes DataFrame (as read from recipes.csv) into index-ready columns.
+    Missing values are left as NaN; records() fills them for the index.
+    Per-stage wall times are added to timings when a Counter is passed.
+    """
+    with timed_stage(timings, 'nutrition'):
+        nutrients = extract_nutrients(df['nutrition'])
+        df = pd.concat([df, nutrients], axis=1)
 
-    df = df.fillna("")
+    with timed_stage(timings, 'calories'):
+        df = df.rename(columns={'recipe_name': 'name'})
+        df['calories'] = calc_calories(df)
 
-    if 'rating' in df.columns:
+    with timed_stage(timings, 'times'):
+        for column, minutes_column in TIME_COLUMNS.items():
+            if column in df.columns:
+                df[minutes_column] = parse_minutes(df[column])
+        if 'servings' in df.columns:
+            # Always float: a chunk with a missing value would otherwise read
+            # as float and the rest as int, and content_hash would differ
+            df['servings'] = pd.to_numeric(df['servings'], errors='coerce').astype(float)
+
+    # Canonical ID, also used as the Elasticsearch _id. The CSV repeats some
+    # recipes verbatim; keep one copy of each.
+    with timed_stage(timings, 'ids'):
+        df.insert(0, 'id', [
+            recipe_id_for({'url': url, 'name': name})
+            for url, name in zip(df['url'].fillna(""), df['name'].fillna(""))
+        ])
+        df = df.drop_duplicates(subset='id').reset_index(drop=True)
+
+    # Structured fields the request-time formatter copies instead of re-splitting
+    with timed_stage(timings, 'ingredients'):
+        df['ingredients_parsed'] = [
+            [parse_ingredient(line) for line in split_ingredients(text)]
+            for text in df['ingredients']
+        ]
+
+    with timed_stage(timings, 'directions'):
+        df['instructions'] = [split_directions(text) for text in df['directions']]
+
+    with timed_stage(timings, 'cuisine'):
+        if 'cuisine_path' in df.columns:
+            df['cuisine_tokens'] = [cuisine_tokens(path) for path in df['cuisine_path']]
+
+    with timed_stage(timings, 'meal_type'):
+        paths = df['cuisine_path'] if 'cuisine_path' in df.columns else [""] * len(df)
+        df['meal_types'] = [
+            meal_types(path, name, calories) for path, name, calories in zip(paths, df['name'], df['calories'])
+        ]
+
+    with timed_stage(timings, 'suggest'):
+        df['suggest'] = [
+            suggest_inputs(name, parsed) for name, parsed in zip(df['name'], df['ingredients_parsed'])
+        ]
+
+    with timed_stage(timings, 'cleanup'):
+        if 'Unnamed: 0' in df.columns:
+            df = df.drop(columns=['Unnamed: 0'])
+
+        if 'rating' in df.columns:
+            # Float in every chunk, like servings; unparseable ratings become NaN
+            df['rating'] = pd.to_numeric(df['rating'], errors='coerce').astype(float)
+
+    return df
+
+
+def records(df):
+    """
+    Turn a processed DataFrame into the list of dicts we index.
+    """
+    return df.fillna("").to_dict(orient='records')
+
+
+def content_hash(recipe):
+    """
+    Stable hash of a recipe record's content, used to tell which indexed
+    documents are unchanged between catalog versions.
+    """
+    payload = json.dumps(recipe, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def load_processed_frame(csv_path=RECIPES_CSV, use_cache=True):
+    """
+    Processed recipes DataFrame, served from the on-disk catalog cache when the
+    CSV and processing code are unchanged since it was written.
+    """
+    key = cache_key(csv_path, CODE_FILES)
+    if use_cache:
+        df = load_frame(CACHE_DIR, key)
+        if df is not None:
+            return df
+
+    df = process_recipes(read_recipes_csv(csv_path))
+    if use_cache:
         try:
-            df['rating'] = df['rating'].astype(float)
-        except ValueError:
-            print("Warning: Couldn't convert some 'rating' values to float.")
+            save_frame(df, CACHE_DIR, key)
+        except OSError as e:
+            print(f"Warning: couldn't write catalog cache: {e}")
+    return df
+
+
+def _process_chunk(chunk):
+    """
+    Worker entry point: process one CSV shard and return its records with the
+    time spent in each stage.
+    """
+    timings = Counter()
+    df = process_recipes(chunk, timings)
+    with timed_stage(timings, 'records'):
+        rows = records(df)
+    return rows, timings
 
-    recipes = df.to_dict(orient='records')
 
-    return recipes
\ No newline at end of file
+def _merge_timings(result, timings):
+    rows, chunk_timings = result
+    if timings is not None:
+        timings.update(chunk_timings)
+    return rows
+
+
+def _new_rows(rows, seen_ids):
+    """
+    rows whose id isn't in seen_ids, adding them to it. process_recipes only
+    drops duplicates within its chunk; the CSV can repeat a recipe across chunks.
+    """
+    for row in rows:
+        if row['id'] not in seen_ids:
+            seen_ids.add(row['id'])
+            yield row
+
+
+def _timed_chunks(chunks, timings):
+    while True:
+        with timed_stage(timings, 'read'):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def iter_recipes(csv_path=RECIPES_CSV, chunksize=CHUNK_SIZE, workers=1, timings=None):
+    """
+    Stream processed recipe dicts from the CSV, one chunk at a time, so memory
+    stays bounded by chunksize rather than the size of the file.
+
+    With workers > 1 the chunks are processed in a process pool. Results are
+    still yielded in file order, and at most 2 * workers chunks are in flight.
+    Stage times (summed over workers) are added to timings if a Counter is given.
+    Each recipe ID is yielded once, like load_and_process_recipes; the seen
+    IDs are the only state kept across chunks.
+    """
+    chunks = _timed_chunks(iter(read_recipes_csv(csv_path, chunksize=chunksize)), timings)
+    seen_ids = set()
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _new_rows(_merge_timings(_process_chunk(chunk), timings), seen_ids)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from _new_rows(_merge_timings(pending.popleft().result(), timings), seen_ids)
+
+        while pending:
+            yield from _new_rows(_merge_timings(pending.popleft().result(), timings), seen_ids)
+
+
+def load_and_process_recipes(csv_path=RECIPES_CSV, use_cache=True):
+    try:
+        df = load_processed_frame(csv_path, use_cache=use_cache)
+    except FileNotFoundError:
+        print("ERROR: 'recipes.csv' not found")
+        exit()
+
+    return records(df)
@@ -15,11 +15,128 @@ def init_extensions(app):
         }
     })
 
+    # Routes check these for None, so set them before anything can fail
+    app.db, app.auth = None, None
+    app.client, app.INDEX_NAME = None, None
+    app.search_templates = False
+    app.search_engine = None
+    app.macro_index = None
+    app.search_cache = None
+    app.candidate_cache = None
+    app.candidate_sources = {}
+
+    global db, auth, client, INDEX_NAME
     try:
-        from services import firebase as firebase_svc, elastic as elastic_svc
-        global db, auth, client, INDEX_NAME
+        from services import firebase as firebase_svc
         app.db, app.auth = firebase_svc.init_firebase(app)
-        app.client, app.INDEX_NAME = elastic_svc.init_elastic()
-        return db, auth, client, INDEX_NAME
     except Exception as e:
-        print("Warning initializing services:", e)
\ No newline at end of file
+        print("Warning initializing Firebase:", e)
+
+    try:
+        from services import elastic as elastic_svc
+        app.client, app.INDEX_NAME = elastic_svc.init_elastic() or (None, None)
+    except Exception as e:
+        print("Warning initializing Elasticsearch:", e)
+
+    init_search_templates(app)
+    init_catalog_indexes(app)
+    init_search_cache(app)
+    init_candidate_cache(app)
+    return db, auth, client, INDEX_NAME
+
+def init_search_templates(app):
+    """
+    Store any missing search templates; if that fails, queries are rendered
+    client-side and sent as full bodies instead.
+    """
+    if app.client is None or not app.config.get("SEARCH_TEMPLATES", True):
+        return
+    try:
+        from services.query_builder import install_templates
+        installed = install_templates(app.client)
+        if installed:
+            print(f"Stored search templates: {', '.join(installed)}")
+        app.search_templates = True
+    except Exception as e:
+        print("Warning storing search templates, sending full query bodies:", e)
+
+def init_catalog_indexes(app):
+    """
+    Build the in-process indexes the config asks for from one shared RecipeStore:
+    the local search index when SEARCH_BACKEND is "local" (or "auto" with no
+    Elasticsearch client), and the macro index when MACRO_INDEX is on.
+    """
+    backend = app.config.get("SEARCH_BACKEND", "elasticsearch")
+    want_search = backend == "local" or (backend == "auto" and app.client is None)
+    want_macros = app.config.get("MACRO_INDEX", False)
+    if not (want_search or want_macros):
+        return
+
+    try:
+        from utils.recipe_store import load_recipe_store
+        store = load_recipe_store()
+    except Exception as e:
+        print("Warning loading recipe catalog:", e)
+        return
+
+    if want_search:
+        try:
+            from services.local_search import LocalSearchEngine
+            app.search_engine = LocalSearchEngine(store)
+            print(f"Local search index built ({len(store)} recipes)")
+        except Exception as e:
+            print("Warning building local search index:", e)
+
+    if want_macros:
+        try:
+            from services.macro_index import MacroIndex
+            app.macro_index = MacroIndex(store)
+            print(f"Macro index built ({len(store)} recipes)")
+        except Exception as e:
+            print("Warning building macro index:", e)
+
+def _alias_generation_fn(app):
+    """
+    Callback for TTLCache that changes whenever the recipes alias is swapped
+    to a new index, or None when results don't come from Elasticsearch.
+    """
+    if app.client is None:
+        return None
+    from services.elastic import alias_target
+    return lambda: alias_target(app.client, app.INDEX_NAME)
+
+def init_search_cache(app):
+    """
+    Response cache for /api/search. With Elasticsearch it is also cleared when
+    the recipes alias moves to a new index; the local index never changes.
+    """
+    maxsize = app.config.get("SEARCH_CACHE_SIZE", 0)
+    if maxsize <= 0:
+        return
+
+    from utils.cache import TTLCache
+    app.search_cache = TTLCache(
+        maxsize=maxsize,
+        ttl=app.config.get("SEARCH_CACHE_TTL", 60),
+        generation_fn=_alias_generation_fn(app) if app.search_engine is None else None,
+        check_interval=app.config.get("SEARCH_CACHE_ALIAS_CHECK", 10),
+    )
+
+def init_candidate_cache(app):
+    """
+    Ranked recommendation candidates per quantized macro target, shared by
+    users with similar targets (see services.recommendations.macro_candidates).
+    Entries share one copy of each recipe through app.candidate_sources.
+    """
+    maxsize = app.config.get("CANDIDATE_CACHE_SIZE", 0)
+    if maxsize <= 0 or app.macro_index is not None:
+        return
+
+    from utils.cache import TTLCache
+    app.candidate_cache = TTLCache(
+        maxsize=maxsize,
+        ttl=app.config.get("CANDIDATE_CACHE_TTL", 600),
+        generation_fn=_alias_generation_fn(app),
+        check_interval=app.config.get("SEARCH_CACHE_ALIAS_CHECK", 10),
+        on_invalidate=app.candidate_sources.clear,
+    )
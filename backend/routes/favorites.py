@@ -1,4 +1,5 @@
 from flask import Blueprint, jsonify, request, current_app as app
+from utils.formatters import recipe_id_for
 bp = Blueprint("favorites", __name__)
 
 @bp.route("/", methods=["GET"])
@@ -57,13 +58,16 @@ def add_recipe():
         return jsonify({"error": f"Invalid auth token: {e}"}), 401
 
     try:
-        source = recipe.get('url') or recipe.get('recipe_name') or recipe.get('name')
-        import hashlib
-        doc_id = hashlib.sha1(str(source).encode('utf-8')).hexdigest() if source else None
+        # Always derived server-side: a client-supplied id could name (and
+        # overwrite) any other favorite document
+        doc_id = recipe_id_for(recipe) or None
 
         favs = app.db.collection('users').document(uid).collection('favorites')
         data_to_save = dict(recipe)
         data_to_save.pop('idToken', None)
+        data_to_save.pop('id', None)
+        if doc_id:
+            data_to_save['id'] = doc_id
 
         if doc_id:
             favs.document(doc_id).set(data_to_save, merge=True)
@@ -121,8 +125,7 @@ def delete_favorite_by_url():
         return jsonify({"error": "Invalid auth token"}), 401
 
     try:
-        import hashlib
-        doc_id = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        doc_id = recipe_id_for({"url": url})
         doc_ref = app.db.collection('users').document(uid).collection('favorites').document(doc_id)
 
         if not doc_ref.get().exists:
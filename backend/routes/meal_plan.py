@@ -1,10 +1,15 @@
 from flask import Blueprint, jsonify, request, current_app as app
 from utils.formatters import format_recipe_for_frontend
-from services.recommendations import generate_meal_plan, get_favorite_recipes, get_fallback_recipes
+from services.meal_planner import MEAL_TYPES
+from services.pregenerate_plans import NEXT_PLAN
+from services.recommendations import generate_meal_plan, get_favorite_recipes, get_fallback_recipes, get_fallback_recipes_batch
 from utils.dates import get_current_week_start
 
 bp = Blueprint("meal_plan", __name__)
 
+SUGGESTIONS_PER_SLOT = 3
+MAX_BATCH_SLOTS = 42
+
 @bp.route("/", methods=["GET"])
 def get_meal_plan():
     if not app.db:
@@ -36,8 +41,9 @@ def get_meal_plan():
             if saved_week_start == current_week_start:
                 return jsonify(plan_data)
             
-            # If week_start doesn't match (new week), auto-generate new plan
-            plan = generate_meal_plan(uid)
+            # New week: use the plan services.pregenerate_plans made ahead of
+            # the rollover, generating one only when there isn't any
+            plan = _pregenerated_plan(uid, current_week_start) or generate_meal_plan(uid)
             if not plan:
                 return jsonify({"error": "Failed to generate meal plan"}), 500
             
@@ -365,70 +371,185 @@ def suggest_recipes_for_slot():
 
     try:
         # Load saved plan if present to determine currently used recipe ids for that day
-        doc_ref = app.db.collection('users').document(uid).collection('meal_plan').document('current')
-        doc = doc_ref.get()
-        used_ids = set()
-        day_block = {}
-        if doc.exists:
-            doc_data = doc.to_dict() or {}
-            plan = doc_data.get('plan', {}) if isinstance(doc_data.get('plan', {}), dict) else {}
-            # find canonical day key (case-insensitive)
-            day_key = next((k for k in plan.keys() if str(k).strip().lower() == str(day).strip().lower()), None)
-            if day_key:
-                day_block = plan.get(day_key) or {}
-                # Collect ids used in that day (so we don't suggest duplicates)
-                for _, r in (day_block.items() if isinstance(day_block, dict) else []):
-                    try:
-                        if isinstance(r, dict) and r.get("id"):
-                            used_ids.add(r.get("id"))
-                    except Exception:
-                        continue
+        plan = _saved_plan(uid)
+        used_ids = _day_recipe_ids(plan, day)
 
         # Also consider favorites we should prioritize
         favorites = get_favorite_recipes(uid) if app.db else []
-        suggestions = []
-        seen = set()
-
-        # Pick favorites first (exclude those already used in the day)
-        for fav in favorites:
-            if not fav:
-                continue
-            fid = fav.get("id")
-            if not fid or fid in used_ids or fid in seen:
-                continue
-            suggestions.append(fav)
-            seen.add(fid)
-            if len(suggestions) >= 3:
-                break
+        suggestions = _favorite_picks(favorites, used_ids, SUGGESTIONS_PER_SLOT)
+        seen = {s["id"] for s in suggestions}
 
         # If not enough, fill using fallback recipes (Elasticsearch) respecting user's macros
-        if len(suggestions) < 3:
-            # get user macros if present
-            user_doc = app.db.collection('users').document(uid).get()
-            macros = {}
-            if user_doc.exists:
-                user_data = user_doc.to_dict() or {}
-                macros = user_data.get('macros', {}) if isinstance(user_data.get('macros', {}), dict) else {}
+        if len(suggestions) < SUGGESTIONS_PER_SLOT:
+            macros = _user_macros(uid)
 
             # Exclude favorites already selected and used ids
             exclude_ids = set(used_ids) | seen
 
-            needed = 3 - len(suggestions)
-            fallbacks = get_fallback_recipes(macros, needed, exclude_ids=exclude_ids)
-            for fb in fallbacks:
-                if not fb:
-                    continue
-                fid = fb.get("id")
-                if fid and fid in seen:
-                    continue
-                suggestions.append(fb)
-                if fid:
-                    seen.add(fid)
-                if len(suggestions) >= 3:
-                    break
+            needed = SUGGESTIONS_PER_SLOT - len(suggestions)
+            fallbacks = get_fallback_recipes(macros, needed, exclude_ids=exclude_ids, meal_type=_meal_type(meal))
+            _extend_suggestions(suggestions, seen, fallbacks)
 
         return jsonify({"status": "success", "suggestions": suggestions}), 200
 
     except Exception as e:
         return jsonify({"error": f"Failed to compute suggestions: {e}"}), 500
 
+@bp.route("/replacements/batch", methods=["POST"])
+def suggest_recipes_for_slots():
+    """
+    Suggest recipes for many meal slots at once for the authenticated user.
+    The saved plan, favorites and macros are loaded once and every slot's
+    fallback candidates are fetched together.
+    Request JSON:
+      {
+        "slots": [{"day": "Monday", "meal": "Lunch"}, ...],
+      }
+    Response JSON:
+      {"status": "success", "slots": [{"day": ..., "meal": ..., "suggestions": [...]}, ...]}
+    """
+    if not app.db:
+        return jsonify({"error": "Firebase not initialized"}), 500
+
+    try:
+        payload = request.get_json(force=True)
+    except Exception:
+        return jsonify({"error": "Invalid JSON"}), 400
+
+    if not payload:
+        return jsonify({"error": "Missing request body"}), 400
+
+    slots = payload.get("slots")
+    if not isinstance(slots, list) or not slots:
+        return jsonify({"error": "Field 'slots' must be a non-empty list"}), 400
+    if len(slots) > MAX_BATCH_SLOTS:
+        return jsonify({"error": f"At most {MAX_BATCH_SLOTS} slots per request"}), 400
+    if not all(isinstance(slot, dict) and slot.get("day") and slot.get("meal") for slot in slots):
+        return jsonify({"error": "Every slot needs 'day' and 'meal' fields"}), 400
+
+    # auth token from header or body
+    auth_header = request.headers.get('Authorization', '')
+    id_token = None
+    if auth_header.startswith('Bearer '):
+        id_token = auth_header.split(' ', 1)[1]
+    else:
+        id_token = payload.get('idToken') if isinstance(payload, dict) else None
+
+    if not id_token:
+        return jsonify({"error": "Missing Authorization token"}), 401
+
+    try:
+        decoded = app.auth.verify_id_token(id_token)
+        uid = decoded.get('uid') or decoded.get('sub')
+        if not uid:
+            return jsonify({"error": "Could not identify user from token"}), 401
+    except Exception as e:
+        return jsonify({"error": f"Invalid auth token: {e}"}), 401
+
+    try:
+        plan = _saved_plan(uid)
+        favorites = get_favorite_recipes(uid)
+
+        results = []
+        pending = []
+        for slot in slots:
+            used_ids = _day_recipe_ids(plan, slot["day"])
+            suggestions = _favorite_picks(favorites, used_ids, SUGGESTIONS_PER_SLOT)
+            seen = {s["id"] for s in suggestions}
+            results.append({"day": slot["day"], "meal": slot["meal"], "suggestions": suggestions})
+            if len(suggestions) < SUGGESTIONS_PER_SLOT:
+                pending.append((
+                    suggestions, seen, SUGGESTIONS_PER_SLOT - len(suggestions), used_ids | seen,
+                    _meal_type(slot["meal"]),
+                ))
+
+        if pending:
+            macros = _user_macros(uid)
+            fallbacks = get_fallback_recipes_batch(
+                macros, [(needed, exclude_ids, meal_type) for _, _, needed, exclude_ids, meal_type in pending]
+            )
+            for (suggestions, seen, _, _, _), slot_fallbacks in zip(pending, fallbacks):
+                _extend_suggestions(suggestions, seen, slot_fallbacks)
+
+        return jsonify({"status": "success", "slots": results}), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Failed to compute suggestions: {e}"}), 500
+
+def _pregenerated_plan(uid, week_start):
+    """
+    The plan dict pre-generated for week_start, or None.
+    """
+    doc = app.db.collection('users').document(uid).collection('meal_plan').document(NEXT_PLAN).get()
+    doc_data = (doc.to_dict() or {}) if doc.exists else {}
+    return doc_data.get('plan') if doc_data.get('week_start') == week_start else None
+
+def _saved_plan(uid):
+    """
+    The plan dict from the user's saved meal plan ({} if there is none).
+    """
+    doc = app.db.collection('users').document(uid).collection('meal_plan').document('current').get()
+    if not doc.exists:
+        return {}
+    doc_data = doc.to_dict() or {}
+    return doc_data.get('plan', {}) if isinstance(doc_data.get('plan', {}), dict) else {}
+
+def _day_recipe_ids(plan, day):
+    """
+    IDs of the recipes already planned on day (so we don't suggest duplicates).
+    """
+    used_ids = set()
+    # find canonical day key (case-insensitive)
+    day_key = next((k for k in plan.keys() if str(k).strip().lower() == str(day).strip().lower()), None)
+    if day_key:
+        day_block = plan.get(day_key) or {}
+        for _, r in (day_block.items() if isinstance(day_block, dict) else []):
+            if isinstance(r, dict) and r.get("id"):
+                used_ids.add(r.get("id"))
+    return used_ids
+
+def _meal_type(meal):
+    """
+    The ingest meal type for a slot's meal name ("Lunch" -> "lunch"), or None
+    for names outside MEALS, which then get unfiltered suggestions.
+    """
+    meal_type = str(meal).strip().lower()
+    return meal_type if meal_type in MEAL_TYPES else None
+
+def _favorite_picks(favorites, used_ids, count):
+    """
+    Up to count favorites not already used that day.
+    """
+    picks = []
+    seen = set()
+    for fav in favorites:
+        if not fav:
+            continue
+        fid = fav.get("id")
+        if not fid or fid in used_ids or fid in seen:
+            continue
+        picks.append(fav)
+        seen.add(fid)
+        if len(picks) >= count:
+            break
+    return picks
+
+def _user_macros(uid):
+    user_doc = app.db.collection('users').document(uid).get()
+    if not user_doc.exists:
+        return {}
+    user_data = user_doc.to_dict() or {}
+    return user_data.get('macros', {}) if isinstance(user_data.get('macros', {}), dict) else {}
+
+def _extend_suggestions(suggestions, seen, fallbacks):
+    for fb in fallbacks:
+        if not fb:
+            continue
+        fid = fb.get("id")
+        if fid and fid in seen:
+            continue
+        suggestions.append(fb)
+        if fid:
+            seen.add(fid)
+        if len(suggestions) >= SUGGESTIONS_PER_SLOT:
+            break
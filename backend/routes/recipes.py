@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify, request, current_app as app
+bp = Blueprint("recipes", __name__)
+
+MAX_IDS = 100
+
+@bp.route("/recipes")
+def get_recipes_by_ids():
+    """
+    Hydrate recipes by ID in one round trip.
+    GET /api/recipes?ids=<id>,<id>,...  (ids may also be repeated)
+    Returns the indexed recipes in the order requested; unknown IDs are skipped.
+    """
+    if not app.client:
+        return jsonify({"error": "Elasticsearch not initialized"}), 500
+
+    ids = []
+    for value in request.args.getlist('ids'):
+        ids.extend(i.strip() for i in value.split(',') if i.strip())
+    ids = list(dict.fromkeys(ids))
+
+    if not ids:
+        return jsonify({"error": "Missing ids query parameter"}), 400
+    if len(ids) > MAX_IDS:
+        return jsonify({"error": f"At most {MAX_IDS} ids per request"}), 400
+
+    try:
+        response = app.client.mget(index=app.INDEX_NAME, ids=ids)
+        results = [doc['_source'] for doc in response['docs'] if doc.get('found')]
+        return jsonify(results)
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred fetching recipes: {e}"}), 500
@@ -1,64 +1,275 @@
+import base64
+import binascii
+import json
+import re
+
 from flask import Blueprint, jsonify, request, current_app as app
+from services import query_builder
+from services.query_builder import AUTOCOMPLETE_TEMPLATE, CUISINE_FACET_SIZE, HISTOGRAMS, SEARCH_TEMPLATE
+from utils.formatters import DISPLAY_FIELDS
 bp = Blueprint("search", __name__)
 
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+def _facets_from_aggs(aggregations):
+    """
+    ES aggregation results in the facets shape LocalSearchEngine.facets returns.
+    """
+    facets = {"cuisines": [
+        {"value": bucket["key"], "count": bucket["doc_count"]}
+        for bucket in aggregations["cuisines"]["buckets"]
+    ]}
+    for name, (_, interval) in HISTOGRAMS.items():
+        facets[name] = [
+            {"from": bucket["key"], "to": bucket["key"] + interval, "count": bucket["doc_count"]}
+            for bucket in aggregations[name]["buckets"]
+        ]
+    return facets
+
+def _encode_cursor(state):
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(",", ":")).encode()).decode()
+
+def _decode_cursor(cursor):
+    """
+    The state behind a next_cursor value, or None if it can't be read.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+def _requested_fields(args):
+    """
+    Source fields to return: ?fields=a,b (or repeated), "*" for everything,
+    default the lean display shape.
+    """
+    fields = []
+    for value in args.getlist('fields'):
+        fields.extend(f.strip() for f in value.split(',') if f.strip())
+    if not fields:
+        return list(DISPLAY_FIELDS)
+    return None if "*" in fields else list(dict.fromkeys(fields))
+
+def parse_search_args(args):
+    """
+    /api/search query parameters as a dict. Raises ValueError on a bad cursor.
+    Shared with the async handlers, so it only touches the args MultiDict.
+    """
+    params = {
+        "query": args.get('q', ""),
+        "min_protein": args.get('min_protein', type=float),
+        "min_calories": args.get('min_calories', type=float),
+        "max_calories": args.get('max_calories', type=float),
+        "max_total_time": args.get('max_total_time', type=int),
+        "min_servings": args.get('min_servings', type=int),
+        "max_servings": args.get('max_servings', type=int),
+        "size": min(max(args.get('size', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE),
+        "fields": _requested_fields(args),
+        # Cuisine names can contain commas, so only repetition separates values
+        "cuisines": sorted({c.strip() for c in args.getlist('cuisine') if c.strip()}),
+        "facets": args.get('facets', "").lower() in ("1", "true", "yes"),
+        "raw_cursor": args.get('cursor') or None,
+        "cursor": None,
+    }
+    if params["raw_cursor"]:
+        params["cursor"] = _decode_cursor(params["raw_cursor"])
+        if params["cursor"] is None:
+            raise ValueError("Invalid cursor")
+        # Local backend cursors page by offset; ES cursors are checked in es_search_request
+        offset = params["cursor"].get("offset", 0)
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            raise ValueError("Invalid cursor")
+    return params
+
+def search_cache_key(params):
+    """
+    Normalized request: whitespace and case in q don't change the results.
+    """
+    fields = params["fields"]
+    return (
+        " ".join(params["query"].lower().split()), params["min_protein"], params["min_calories"],
+        params["max_calories"], params["max_total_time"], params["min_servings"], params["max_servings"],
+        tuple(params["cuisines"]), params["facets"],
+        params["size"], tuple(fields) if fields is not None else None, params["raw_cursor"],
+    )
+
+def local_search_payload(engine, params):
+    """
+    Run a search against the in-process LocalSearchEngine.
+    """
+    ranges = {
+        "protein_grams": (params["min_protein"], None),
+        "calories": (params["min_calories"], params["max_calories"]),
+        "total_minutes": (None, params["max_total_time"]),
+        "servings": (params["min_servings"], params["max_servings"]),
+    }
+    cursor, size = params["cursor"], params["size"]
+    offset = cursor.get("offset", 0) if cursor else 0
+    results = engine.search(
+        params["query"], ranges, size, offset=offset, fields=params["fields"], cuisines=params["cuisines"]
+    )
+    next_cursor = _encode_cursor({"offset": offset + size}) if len(results) == size else None
+    payload = {"recipes": results, "next_cursor": next_cursor}
+    if params["facets"] and not cursor:
+        payload["facets"] = engine.facets(
+            params["query"], ranges, params["cuisines"], cuisine_size=CUISINE_FACET_SIZE, histograms=HISTOGRAMS
+        )
+    return payload
+
+def _range(low=None, high=None):
+    bounds = {}
+    if low is not None:
+        bounds['gte'] = low
+    if high is not None:
+        bounds['lte'] = high
+    return bounds
+
+def es_search_request(params, alias):
+    """
+    (index, SEARCH_TEMPLATE params) for an Elasticsearch search. Raises
+    ValueError on a cursor that doesn't point at one of alias's versioned indices.
+    """
+    ranges = {
+        "protein_grams": _range(params["min_protein"]),
+        "calories": _range(params["min_calories"], params["max_calories"]),
+        "total_minutes": _range(high=params["max_total_time"]),
+        "servings": _range(params["min_servings"], params["max_servings"]),
+    }
+
+    # Later pages stay on the index the first page came from, so an alias
+    # swap mid-way through paging doesn't reshuffle the results
+    index, after = alias, None
+    cursor = params["cursor"]
+    if cursor:
+        index, after = cursor.get("index"), cursor.get("after")
+        # The cursor comes from the client: accept only a single concrete
+        # build of alias (services.elastic.new_index_name), never a list or
+        # pattern. A cluster still on the pre-alias concrete index reports the
+        # alias name itself as _index until its next rebuild.
+        if not (isinstance(index, str)
+                and (index == alias or re.fullmatch(rf"{re.escape(alias)}-\d{{14}}", index))):
+            raise ValueError("Invalid cursor")
+        # search_after holds the last hit's sort values: [_score, id]
+        if not (isinstance(after, list) and len(after) == 2
+                and isinstance(after[0], (int, float)) and isinstance(after[1], str)):
+            raise ValueError("Invalid cursor")
+
+    template_params = query_builder.search_params(
+        params["query"], ranges, params["size"], fields=params["fields"], cuisines=params["cuisines"],
+        # Facets describe the whole result set, so only the first page needs them
+        after=after, facets=params["facets"] and not cursor,
+    )
+    return index, template_params
+
+def es_search_payload(params, response):
+    hits = response['hits']['hits']
+    results = [hit.get('_source', {}) for hit in hits]
+
+    next_cursor = None
+    if len(hits) == params["size"]:
+        next_cursor = _encode_cursor({"index": hits[-1]['_index'], "after": hits[-1]['sort']})
+    payload = {"recipes": results, "next_cursor": next_cursor}
+    if "aggregations" in response:
+        payload["facets"] = _facets_from_aggs(response["aggregations"])
+    return payload
+
+def _cache_response(key, payload):
+    if app.search_cache is not None:
+        app.search_cache.set(key, payload)
+    return jsonify(payload)
+
 @bp.route("/search")
 def search_recipes():
+    """
+    GET /api/search?q=&<filters>&cuisine=&size=&fields=&cursor=&facets=1
+    Returns {"recipes": [...], "next_cursor": <opaque string or null>}; pass
+    next_cursor back as cursor (with the same query) for the next page.
+    cuisine (repeatable) matches any level of the cuisine path, e.g.
+    "Desserts" or "Desserts/Pies". With facets=1 the first page also carries
+    "facets": cuisine token counts and calorie/protein histograms.
+    """
+    try:
+        params = parse_search_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    cache_key = search_cache_key(params)
+    if app.search_cache is not None:
+        cached = app.search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify(cached)
+
+    if app.search_engine is not None:
+        try:
+            return _cache_response(cache_key, local_search_payload(app.search_engine, params))
+        except Exception as e:
+            return jsonify({"error": f"An error occurred during search: {e}"}), 500
+
     if not app.client:
         return jsonify({"error": "Elasticsearch not initialized"}), 500
-    
-    query = request.args.get('q', "")
-    min_protein = request.args.get('min_protein', type=float)
-    min_calories = request.args.get('min_calories', type=float)
-    max_calories = request.args.get('max_calories', type=float)
 
     try:
-        must_clauses = []
-        if query:
-            must_clauses.append({
-                "multi_match": {
-                    "query": query,
-                    "fields": ["name", "ingredients"],
-                    "fuzziness": "AUTO"
-                }
-            })
-        else:
-            must_clauses.append({"match_all": {}})
-
-        filters = []
-
-        protein = {}
-        if min_protein is not None:
-            protein['gte'] = min_protein
-        if protein:
-            filters.append({"range": {"protein_grams": protein}})
-
-        calories_range = {}
-        if min_calories is not None:
-            calories_range['gte'] = min_calories
-        if max_calories is not None:
-            calories_range['lte'] = max_calories
-        if calories_range:
-            filters.append({"range": {"calories": calories_range}})
-
-        search_body = {
-            "query": {
-                "bool": {
-                    "must": must_clauses,
-                    "filter": filters
-                }
-            }
-        }
-
-        response = app.client.search(index=app.INDEX_NAME, body=search_body)
-        results = [hit['_source'] for hit in response['hits']['hits']]
-        return jsonify(results)
+        index, template_params = es_search_request(params, app.INDEX_NAME)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        response = query_builder.search(app.client, index, SEARCH_TEMPLATE, template_params)
+        return _cache_response(cache_key, es_search_payload(params, response))
 
     except Exception as e:
         return jsonify({"error": f"An error occurred during search: {e}"}), 500
 
+@bp.route("/search/cache")
+def search_cache_stats():
+    """
+    Hit/miss counters for the /api/search response cache.
+    """
+    if app.search_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **app.search_cache.stats()})
+
+def autocomplete_results(response):
+    results = []
+    seen = set()
+    for option in response['suggest']['recipes'][0]['options']:
+        source = option.get('_source', {})
+        if source.get('id') in seen:
+            continue
+        seen.add(source.get('id'))
+        results.append({"id": source.get('id'), "name": source.get('name')})
+    return results
+
+@bp.route("/autocomplete")
+def autocomplete():
+    """
+    Type-ahead suggestions for the search box.
+    GET /api/autocomplete?q=<prefix>&size=<n>  ->  [{"id": ..., "name": ...}, ...]
+    Uses the completion suggester (recipe names and ingredient names), so it
+    is cheap enough to call on every keystroke.
+    """
+    if not app.client:
+        return jsonify({"error": "Elasticsearch not initialized"}), 500
+
+    prefix = request.args.get('q', "").strip()
+    size = min(max(request.args.get('size', 8, type=int), 1), 20)
+    if not prefix:
+        return jsonify([])
+
+    try:
+        response = query_builder.search(
+            app.client, app.INDEX_NAME, AUTOCOMPLETE_TEMPLATE, query_builder.autocomplete_params(prefix, size)
+        )
+        return jsonify(autocomplete_results(response))
+
+    except Exception as e:
+        return jsonify({"error": f"An error occurred during autocomplete: {e}"}), 500
+
 @bp.route("/recommendations/<user_id>")
 def get_recommendations(user_id):
-    if not app.db or not app.client:
+    if not app.db or not (app.client or app.macro_index):
         return jsonify({"error": "Services not initialized"}), 500
 
     try:
@@ -74,40 +285,17 @@ def get_recommendations(user_id):
         if not macros:
             return jsonify({"error": "User has no macro data"}), 404
 
-        daily_calories = float(macros.get('calories', 2000))
-        daily_protein = float(macros.get('protein', 50))
-        daily_carbs = float(macros.get('carbs', 300))
-        daily_fat = float(macros.get('fat', 70))
-
     except Exception as e:
         return jsonify({"error": f"Firebase error: {str(e)}"}), 500
 
-    target_calories = daily_calories / 3
-    target_protein = daily_protein / 3
-    target_carbs = daily_carbs / 3
-    target_fat = daily_fat / 3
-
-    search_body = {
-        "size": 10,
-        "query": {
-            "function_score": {
-                "query": {"match_all": {}},
-                "functions": [
-                    {"gauss": {"calories": {"origin": target_calories, "offset": 50, "scale": 100}}},
-                    {"gauss": {"protein_grams": {"origin": target_protein, "offset": 5, "scale": 10}}},
-                    {"gauss": {"carbs_grams": {"origin": target_carbs, "offset": 10, "scale": 20}}},
-                    {"gauss": {"fat_grams": {"origin": target_fat, "offset": 5, "scale": 10}}},
-                ],
-                "score_mode": "multiply",
-                "boost_mode": "multiply"
-            }
-        }
-    }
+    if app.macro_index is not None:
+        from services.macro_index import meal_targets
+        nearest = app.macro_index.nearest(meal_targets(macros), 10)
+        return jsonify([recipe.to_dict() for recipe in nearest])
 
     try:
-        response = app.client.search(index=app.INDEX_NAME, body=search_body)
-        results = [hit['_source'] for hit in response['hits']['hits']]
-        return jsonify(results)
+        from services.recommendations import macro_candidates
+        return jsonify(macro_candidates(macros)[:10])
 
     except Exception as e:
         return jsonify({"error": f"An error occurred during search: {e}"}), 500
@@ -1,37 +1,55 @@
+import itertools
 import os
-from data_processing import load_and_process_recipes
-from elasticsearch import Elasticsearch
+import time
+from data_processing import NUTRIENTS, TIME_COLUMNS, content_hash, load_and_process_recipes
+from elasticsearch import BadRequestError, Elasticsearch
 from dotenv import load_dotenv
 from elasticsearch import helpers
+from services.indexer import bulk_index, bulk_load_settings
 
 load_dotenv()
 
 ES_HOST = "http://localhost:9200"
 ES_API_KEY = os.getenv("ES_API_KEY")
 client = None
+# The app only ever queries this name; it is an alias over a versioned index
 INDEX_NAME = "recipes"
 
+# Stored in _source for display but never searched, sorted or aggregated on
+DISPLAY_ONLY = {"type": "keyword", "index": False, "doc_values": False}
+DISPLAY_ONLY_TEXT = {"type": "text", "index": False}
+
+MACRO_FIELDS = ["calories", "protein_grams", "fat_grams", "carbs_grams"]
+
 MAPPING = {
-    # ... (your mapping is correct, no changes needed) ...
     "properties": {
-        "name": {"type": "text"},
-        "prep_time": {"type": "text"},
-        "cook_time": {"type": "text"},
-        "total_time": {"type": "text"},
-        "servings": {"type": "text"},
-        "yield": {"type": "text"},
+        "id": {"type": "keyword"},
+        "name": {
+            "type": "text",
+            "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}
+        },
         "ingredients": {"type": "text"},
-        "directions": {"type": "text"},
+        "suggest": {"type": "completion"},
+        "cuisine_tokens": {"type": "keyword"},
+        "meal_types": {"type": "keyword"},
         "rating": {"type": "float"},
-        "url": {"type": "keyword"},
-        "cuisine_path": {"type": "text"},
-        "nutrition": {"type": "text"},
-        "calories": {"type": "float"},
-        "protein_grams": {"type": "float"},
-        "fat_grams": {"type": "float"},
-        # ... etc ...
-        "carbs_grams": {"type": "float"},
-        "img_src": {"type": "keyword"}
+        "servings": {"type": "integer"},
+        **{minutes: {"type": "integer"} for minutes in TIME_COLUMNS.values()},
+        **{field: {"type": "float"} for field in MACRO_FIELDS},
+        **{field: {"type": "float", "index": False, "doc_values": False}
+           for field in NUTRIENTS if field not in MACRO_FIELDS},
+
+        **{display: DISPLAY_ONLY for display in TIME_COLUMNS},
+        "yield": DISPLAY_ONLY,
+        "url": DISPLAY_ONLY,
+        "img_src": DISPLAY_ONLY,
+        "cuisine_path": DISPLAY_ONLY,
+        "content_hash": DISPLAY_ONLY,
+        "directions": DISPLAY_ONLY_TEXT,
+        "instructions": DISPLAY_ONLY_TEXT,
+        "nutrition": DISPLAY_ONLY_TEXT,
+        "timing": DISPLAY_ONLY_TEXT,
+        "ingredients_parsed": {"type": "object", "enabled": False}
     }
 }
 
@@ -57,38 +75,297 @@ def init_elastic():
         pass
 
 
-# This special block only runs when you execute: python3 elastic.py
-# It will NOT run when app.py imports this file.
-if __name__ == "__main__":
-    
+async def init_async_elastic():
+    """
+    AsyncElasticsearch client for the ASGI app, or None if the cluster is unreachable.
+    """
+    from elasticsearch import AsyncElasticsearch
+    async_client = AsyncElasticsearch(ES_HOST, api_key=ES_API_KEY)
+    try:
+        if not await async_client.ping():
+            raise ConnectionError("couldnt connect")
+        print("Async Elasticsearch client connected!")
+        return async_client
+    except Exception as e:
+        print(f"Async connection failed: {e}")
+        await async_client.close()
+        return None
+
+
+def generate_actions(recipes, index=INDEX_NAME):
+    """
+    Bulk actions for an iterable of recipe dicts. Lazy, so the bulk indexer pulls
+    documents as it sends them instead of building one big list.
+    """
+    for recipe in recipes:
+        yield {
+            "_index": index,
+            "_id": recipe["id"],
+            "_source": {**recipe, "content_hash": content_hash(recipe)}
+        }
+
+
+def sync_index(client, recipes, index=INDEX_NAME, **bulk_options):
+    """
+    Bring an existing index in line with recipes without rebuilding it.
+    Documents are keyed by recipe ID: recipes whose content_hash matches the
+    indexed copy are left alone, new or edited recipes are (re)indexed in
+    place, and indexed IDs that no longer appear in the catalog are deleted.
+    Returns a dict of counts.
+    """
+    indexed = {
+        hit["_id"]: hit["_source"].get("content_hash")
+        for hit in helpers.scan(client, index=index, _source=["content_hash"])
+    }
+
+    counts = {"unchanged": 0, "indexed": 0, "deleted": 0}
+    seen = set()
+
+    def changed_recipes():
+        for action in generate_actions(recipes, index):
+            doc_id = action["_id"]
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            if indexed.pop(doc_id, None) == action["_source"]["content_hash"]:
+                counts["unchanged"] += 1
+                continue
+            counts["indexed"] += 1
+            yield action
+
+    def removed_docs():
+        # Runs after changed_recipes() is exhausted, so only stale ids remain
+        for doc_id in indexed:
+            counts["deleted"] += 1
+            yield {"_op_type": "delete", "_index": index, "_id": doc_id}
+
+    bulk_index(client, itertools.chain(changed_recipes(), removed_docs()), **bulk_options)
+    return counts
+
+
+def new_index_name(alias=INDEX_NAME):
+    """
+    Versioned index name for a fresh build, e.g. recipes-20250101120000.
+    """
+    return f"{alias}-{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def warm_index(client, index):
+    """
+    Make a freshly built index searchable and run the app's common queries
+    once, so the first real requests after the swap don't pay for cold caches.
+    """
+    client.indices.refresh(index=index)
+    client.search(index=index, query={"match_all": {}}, size=10)
+    client.search(index=index, query={"range": {"calories": {"gte": 0}}}, size=10)
+
+
+def swap_alias(client, new_index, alias=INDEX_NAME):
+    """
+    Atomically point alias at new_index. A concrete index still using the
+    alias name (from before versioned builds) is dropped in the same call.
+    """
+    actions = []
+    if client.indices.exists_alias(name=alias):
+        for old_index in client.indices.get_alias(name=alias):
+            actions.append({"remove": {"index": old_index, "alias": alias}})
+    elif client.indices.exists(index=alias):
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias}})
+    client.indices.update_aliases(actions=actions)
+
+
+def _field_settings(field):
+    return (field.get("type", "object"), field.get("index", True), field.get("doc_values", True),
+            field.get("enabled", True))
+
+
+def mapping_conflicts(client, index=INDEX_NAME):
+    """
+    Fields whose mapping on the existing index differs from MAPPING in a way
+    put_mapping can't change in place (type, index, doc_values, enabled),
+    e.g. a pre-redesign index with float minutes. Fields MAPPING adds are fine.
+    """
+    conflicts = []
+    for name, existing in client.indices.get_mapping(index=index).items():
+        properties = existing.get("mappings", {}).get("properties", {})
+        for field, wanted in MAPPING["properties"].items():
+            if field in properties and _field_settings(properties[field]) != _field_settings(wanted):
+                conflicts.append(f"{name}: '{field}' is mapped as {properties[field]}, needs {wanted}")
+    return conflicts
+
+
+def alias_target(client, alias=INDEX_NAME):
+    """
+    Name(s) of the index behind alias, comma-joined; the alias itself if it
+    is still a concrete index. Changes whenever a rebuild swaps the alias.
+    """
+    if client.indices.exists_alias(name=alias):
+        return ",".join(sorted(client.indices.get_alias(name=alias)))
+    return alias
+
+
+async def alias_target_async(client, alias=INDEX_NAME):
+    """
+    alias_target on an AsyncElasticsearch client.
+    """
+    if await client.indices.exists_alias(name=alias):
+        return ",".join(sorted(await client.indices.get_alias(name=alias)))
+    return alias
+
+
+def prune_indices(client, alias=INDEX_NAME, keep=1):
+    """
+    Delete old versioned indices, keeping the one behind the alias plus the
+    `keep` most recent previous builds for rollback. Returns deleted names.
+    """
+    live = set(client.indices.get_alias(name=alias)) if client.indices.exists_alias(name=alias) else set()
+    versions = sorted(client.indices.get(index=f"{alias}-*", expand_wildcards="open,closed"), reverse=True)
+    previous = [name for name in versions if name not in live]
+    stale = previous[keep:]
+    for name in stale:
+        client.indices.delete(index=name)
+    return stale
+
+
+def print_timings(timings, wall_seconds, docs):
+    """
+    Per-stage processing times. Worker stages are summed across processes, so
+    with --workers they can add up to more than the wall time.
+    """
+    print("Stage timings (seconds):")
+    for stage, seconds in timings.most_common():
+        print(f"  {stage:<12} {seconds:8.2f}")
+    rate = docs / wall_seconds if wall_seconds else 0
+    print(f"  {'wall':<12} {wall_seconds:8.2f}  ({rate:,.0f} docs/s)")
+
+
+def main(argv=None):
+    import argparse
+    from collections import Counter
+    from data_processing import CHUNK_SIZE, iter_recipes, timed_stage
+
+    parser = argparse.ArgumentParser(description="Rebuild the recipes index from data/recipes.csv")
+    parser.add_argument("--csv", default="data/recipes.csv", help="recipes CSV to index")
+    parser.add_argument("--stream", action="store_true",
+                        help="read and index the CSV in chunks instead of loading it whole")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE,
+                        help="rows per chunk with --stream or --workers")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes used to parse CSV chunks (implies --stream when > 1)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore the processed catalog cache")
+    parser.add_argument("--sync", action="store_true",
+                        help="only index new/changed recipes and delete removed ones instead of rebuilding")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent bulk requests")
+    parser.add_argument("--bulk-size", type=int, default=500, help="documents per bulk request")
+    parser.add_argument("--bulk-mb", type=float, default=10, help="max size of one bulk request in MB")
+    parser.add_argument("--max-retries", type=int, default=3,
+                        help="retries for documents rejected with 429/5xx")
+    parser.add_argument("--progress-interval", type=float, default=5,
+                        help="seconds between progress lines")
+    parser.add_argument("--keep", type=int, default=1,
+                        help="previous index versions to keep after the alias swap")
+    args = parser.parse_args(argv)
+    bulk_options = {
+        "threads": args.threads,
+        "chunk_size": args.bulk_size,
+        "max_chunk_bytes": int(args.bulk_mb * 1024 * 1024),
+        "max_retries": args.max_retries,
+        "progress_interval": args.progress_interval,
+    }
+
     print("Running Elasticsearch setup...")
-    
+    init_elastic()
+
     # Check connection again, in case it failed silently above
-    if not client.ping():
+    if not client or not client.ping():
         print("Cannot run setup. Elasticsearch client is not connected.")
         exit()
 
-    # Deletes and creates old index and mappings per run
-    if client.indices.exists(index=INDEX_NAME):
-        print(f"Deleting old index '{INDEX_NAME}'")
-        client.indices.delete(index=INDEX_NAME)
+    sync = args.sync and client.indices.exists(index=INDEX_NAME)
+    if sync:
+        target = INDEX_NAME
+        print(f"Syncing existing index '{INDEX_NAME}'")
+        # Catch an index built with an older mapping before touching any documents
+        conflicts = mapping_conflicts(client)
+        try:
+            if not conflicts:
+                client.indices.put_mapping(index=INDEX_NAME, properties=MAPPING["properties"])
+        except BadRequestError as e:
+            conflicts = [str(e)]
+        if conflicts:
+            print(f"Cannot sync: '{INDEX_NAME}' was built with an incompatible mapping:")
+            for conflict in conflicts:
+                print(f"  {conflict}")
+            print("Run a full rebuild (without --sync) to build a new index with the current mapping.")
+            exit(1)
+    else:
+        # Build into a new versioned index; the alias keeps serving the old one
+        target = new_index_name()
+        print(f"Creating new index '{target}'")
+        client.indices.create(index=target, mappings=MAPPING)
 
-    print(f"Creating new index '{INDEX_NAME}'")
-    client.indices.create(index=INDEX_NAME, mappings=MAPPING)
+    timings = Counter()
+    start = time.perf_counter()
+    # Until the alias points at it, a new build is incomplete: any failure
+    # (bulk errors, a bad CSV row, a transport error, Ctrl-C) must delete it,
+    # or prune_indices would later keep it as the rollback build
+    swapped = False
+    try:
+        if args.stream or args.workers > 1:
+            print(f"Streaming recipes from {args.csv} in chunks of {args.chunksize} "
+                  f"with {args.workers} worker(s)...")
+            recipes = iter_recipes(args.csv, chunksize=args.chunksize, workers=args.workers, timings=timings)
+        else:
+            print("Loading real recipe data from CSV...")
+            with timed_stage(timings, 'load'):
+                recipes = load_and_process_recipes(args.csv, use_cache=not args.no_cache)
+            print(f"Loaded {len(recipes)} recipes from CSV.")
 
-    print("Loading real recipe data from CSV...")
-    recipes = load_and_process_recipes()
-    print(f"Loaded {len(recipes)} recipes from CSV.")
+        try:
+            if sync:
+                print("Syncing documents with Elasticsearch...")
+                counts = sync_index(client, recipes, **bulk_options)
+                print(f"Indexed {counts['indexed']}, deleted {counts['deleted']}, "
+                      f"left {counts['unchanged']} unchanged.")
+                indexed = counts['indexed']
+            else:
+                print(f"Indexing documents into Elasticsearch with {args.threads} thread(s)...")
+                with bulk_load_settings(client, target):
+                    indexed = bulk_index(client, generate_actions(recipes, target), **bulk_options).ok
+                print(f"Indexed {indexed} documents.")
+        except helpers.BulkIndexError as e:
+            print(f"Indexing failed: {e.args[0]}")
+            for error in e.errors:
+                print(f"  {error}")
+            exit(1)
 
-    actions = [
-        {
-            "_index": INDEX_NAME,
-            "_source": recipe
-        }
-        for recipe in recipes
-    ]
+        if not sync:
+            print(f"Warming '{target}' and pointing alias '{INDEX_NAME}' at it")
+            warm_index(client, target)
+            swap_alias(client, target)
+            swapped = True
+    finally:
+        if not sync and not swapped:
+            print(f"Deleting incomplete index '{target}'; '{INDEX_NAME}' is unchanged.")
+            try:
+                client.indices.delete(index=target)
+            except Exception as e:
+                print(f"Could not delete '{target}', remove it by hand: {e}")
+
+    if not sync:
+        for name in prune_indices(client, keep=args.keep):
+            print(f"Deleted old index '{name}'")
 
-    print(f"Indexing {len(actions)} documents into Elasticsearch...")
-    helpers.bulk(client, actions)
-    
-    print("Elasticsearch setup and indexing complete! 🚀")
\ No newline at end of file
+    from services.query_builder import install_templates
+    for template_id in install_templates(client):
+        print(f"Stored search template '{template_id}'")
+    print_timings(timings, time.perf_counter() - start, indexed)
+
+    print("Elasticsearch setup and indexing complete! 🚀")
+
+
+# This special block only runs when you execute: python3 elastic.py
+# It will NOT run when app.py imports this file.
+if __name__ == "__main__":
+    main()
@@ -17,3 +17,16 @@ def init_firebase(app=None):
     except Exception as e:
         print("Firebase init error:", e)
         return None, None
+
+def init_firestore_async(app=None):
+    """
+    Async Firestore client for the ASGI app (same project as init_firebase).
+    """
+    try:
+        from firebase_admin import firestore_async
+        if not firebase_admin._apps:
+            init_firebase(app)
+        return firestore_async.client()
+    except Exception as e:
+        print("Async Firestore init error:", e)
+        return None
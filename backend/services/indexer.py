@@ -0,0 +1,153 @@
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from elasticsearch import TransportError, helpers
+
+# Bulk item statuses worth retrying: rejected (queue full) or node unavailable
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class BulkProgress:
+    """
+    Thread-safe counters for a bulk load, printed every `interval` seconds.
+    """
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.ok = 0
+        self.failed = 0
+        self.retried = 0
+        self.chunks = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def record_chunk(self, ok, errors, retried):
+        with self._lock:
+            self.ok += ok
+            self.failed += len(errors)
+            self.retried += retried
+            self.chunks += 1
+            # Keep a sample of errors for the final exception
+            self.errors.extend(errors[:max(0, 10 - len(self.errors))])
+            if errors:
+                print(f"  chunk {self.chunks}: {len(errors)} failed after retries "
+                      f"(first: {errors[0]})")
+            now = time.perf_counter()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self.report()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.ok / elapsed if elapsed else 0.0
+
+    def report(self, prefix="  progress"):
+        print(f"{prefix}: {self.ok:,} ok, {self.failed:,} failed, {self.retried:,} retried, "
+              f"{self.rate():,.0f} docs/s")
+
+
+def _send_chunk(client, chunk, max_chunk_bytes, max_retries, initial_backoff):
+    """
+    Send one chunk with streaming_bulk, resending items that failed with a
+    retryable status (or that had no result yet when a transport error cut
+    the chunk short) with exponential backoff.
+    Returns (ok_count, errors, retried_count).
+    """
+    pending, ok, errors, retried = chunk, 0, [], 0
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(initial_backoff * 2 ** (attempt - 1))
+            retried += len(pending)
+
+        retry = []
+        # Items of pending with a result so far; streaming_bulk may split the
+        # chunk into several requests and fail on a later one
+        done = 0
+        try:
+            results = helpers.streaming_bulk(
+                client, pending, chunk_size=len(pending), max_chunk_bytes=max_chunk_bytes,
+                raise_on_error=False, raise_on_exception=False, yield_ok=True,
+            )
+            # streaming_bulk reports items in the order they were sent
+            for action, (success, item) in zip(pending, results):
+                done += 1
+                if success:
+                    ok += 1
+                    continue
+                info = next(iter(item.values()))
+                if info.get("status") in RETRY_STATUSES and attempt < max_retries:
+                    retry.append(action)
+                else:
+                    errors.append(item)
+        except TransportError as e:
+            unsent = pending[done:]
+            if attempt == max_retries:
+                errors.extend({"error": str(e), "_id": action.get("_id")} for action in retry + unsent)
+            else:
+                retry += unsent
+
+        if not retry:
+            break
+        pending = retry
+
+    return ok, errors, retried
+
+
+def bulk_index(client, actions, threads=4, chunk_size=500, max_chunk_bytes=10 * 1024 * 1024,
+               max_retries=3, initial_backoff=1.0, progress_interval=5.0, raise_on_error=True):
+    """
+    Index an iterable of bulk actions with `threads` concurrent bulk requests.
+    Actions are consumed lazily, with at most 2 * threads chunks in flight.
+    Prints live progress and per-chunk failures; raises BulkIndexError at the
+    end if anything failed after retries (unless raise_on_error is False).
+    Returns the BulkProgress with the final counts.
+    """
+    progress = BulkProgress(progress_interval)
+    actions = iter(actions)
+    chunks = iter(lambda: list(itertools.islice(actions, chunk_size)), [])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        in_flight = deque()
+        for chunk in chunks:
+            in_flight.append(pool.submit(
+                _send_chunk, client, chunk, max_chunk_bytes, max_retries, initial_backoff
+            ))
+            if len(in_flight) >= threads * 2:
+                progress.record_chunk(*in_flight.popleft().result())
+        while in_flight:
+            progress.record_chunk(*in_flight.popleft().result())
+
+    progress.report("  done")
+    if progress.failed and raise_on_error:
+        raise helpers.BulkIndexError(f"{progress.failed} document(s) failed to index", progress.errors)
+    return progress
+
+
+@contextmanager
+def bulk_load_settings(client, index):
+    """
+    Turn off refreshes and replicas on index while it is bulk loaded, then put
+    the previous settings back and refresh once.
+    """
+    names = ["index.refresh_interval", "index.number_of_replicas"]
+    current = client.indices.get_settings(index=index, name=names, flat_settings=True)
+    previous = {name: None for name in names}
+    for settings in current.values():
+        previous.update(settings.get("settings", {}))
+
+    client.indices.put_settings(index=index, settings={
+        "index.refresh_interval": "-1",
+        "index.number_of_replicas": 0,
+    })
+    try:
+        yield
+    finally:
+        # None resets a setting that wasn't set explicitly back to its default
+        client.indices.put_settings(index=index, settings=previous)
+        client.indices.refresh(index=index)
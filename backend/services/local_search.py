@@ -0,0 +1,188 @@
+import math
+import re
+
+import numpy as np
+
+# Fields the ES path runs multi_match over
+TEXT_FIELDS = ["name", "ingredients"]
+# Fields the ES path range-filters on
+RANGE_FIELDS = ["calories", "protein_grams", "total_minutes", "servings"]
+
+# Elasticsearch's BM25 defaults
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if isinstance(text, str) else []
+
+
+class _FieldIndex:
+    """
+    Inverted index for one text field: term -> (row numbers, term frequencies).
+    """
+
+    def __init__(self, values):
+        postings = {}
+        lengths = np.zeros(len(values), dtype=np.float32)
+        for row, value in enumerate(values):
+            tokens = tokenize(value)
+            lengths[row] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(row)
+                postings[token][1].append(count)
+
+        self.postings = {
+            token: (np.array(rows, dtype=np.int32), np.array(tfs, dtype=np.float32))
+            for token, (rows, tfs) in postings.items()
+        }
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() else 1.0
+        self.size = len(values)
+
+    def score(self, terms):
+        """
+        BM25 score of every row for the query terms (0 where nothing matched).
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (self.size - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = K1 * (1 - B + B * self.lengths[rows] / self.avg_length)
+            scores[rows] += idf * tfs * (K1 + 1) / (tfs + norm)
+        return scores
+
+
+class LocalSearchEngine:
+    """
+    In-process stand-in for the /api/search Elasticsearch query, built from a
+    RecipeStore: BM25 over name and ingredients (scored like multi_match's
+    best_fields, without fuzziness) plus pre-sorted numeric columns for the
+    range filters. Intended for catalogs small enough to keep in memory.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.fields = {field: _FieldIndex(store.column(field)) for field in TEXT_FIELDS if field in store.columns}
+
+        # Sorted copy of each range column; NaN sorts last and never matches
+        self.sorted = {}
+        for field in RANGE_FIELDS:
+            if field not in store.numeric:
+                continue
+            values = store.numeric[field].astype(np.float64)
+            order = np.argsort(values, kind="stable")
+            valid = int(np.count_nonzero(~np.isnan(values)))
+            self.sorted[field] = (values[order], order, valid)
+
+        # Cuisine facet token -> rows carrying it
+        self.cuisine_rows = {}
+        if "cuisine_tokens" in store.columns:
+            postings = {}
+            for row, tokens in enumerate(store.column("cuisine_tokens")):
+                for token in tokens:
+                    postings.setdefault(token, []).append(row)
+            self.cuisine_rows = {token: np.array(rows, dtype=np.int32) for token, rows in postings.items()}
+
+    def _range_mask(self, field, gte=None, lte=None):
+        values, order, valid = self.sorted[field]
+        lo = np.searchsorted(values[:valid], gte, side="left") if gte is not None else 0
+        hi = np.searchsorted(values[:valid], lte, side="right") if lte is not None else valid
+        mask = np.zeros(len(self.store), dtype=bool)
+        mask[order[lo:hi]] = True
+        return mask
+
+    def _match(self, query, ranges, cuisines):
+        """
+        (scores or None for match_all, boolean mask of matching rows)
+        """
+        terms = tokenize(query)
+        if terms:
+            scores = np.max([index.score(terms) for index in self.fields.values()], axis=0)
+            mask = scores > 0
+        else:
+            # match_all: every document scores the same, ES returns index order
+            scores = None
+            mask = np.ones(len(self.store), dtype=bool)
+
+        for field, (gte, lte) in (ranges or {}).items():
+            if gte is None and lte is None:
+                continue
+            if field not in self.sorted:
+                return scores, np.zeros(len(self.store), dtype=bool)
+            mask &= self._range_mask(field, gte, lte)
+
+        if cuisines:
+            allowed = np.zeros(len(self.store), dtype=bool)
+            for cuisine in cuisines:
+                allowed[self.cuisine_rows.get(cuisine, [])] = True
+            mask &= allowed
+        return scores, mask
+
+    def search_rows(self, query="", ranges=None, size=10, offset=0, cuisines=None):
+        """
+        Row numbers of the best matches, best first, skipping the first offset.
+        ranges maps a RANGE_FIELDS name to a (gte, lte) pair; either end may be None.
+        cuisines keeps rows carrying any of the given cuisine tokens.
+        """
+        scores, mask = self._match(query, ranges, cuisines)
+
+        rows = np.flatnonzero(mask)
+        end = offset + size
+        if scores is None:
+            return rows[offset:end].tolist()
+
+        if len(rows) > end:
+            # Keep everything scoring at least the end-th best, ties included
+            cutoff = np.partition(-scores[rows], end - 1)[end - 1]
+            rows = rows[-scores[rows] <= cutoff]
+        # Sort on (score desc, row) so pages are stable across calls
+        rows = rows[np.lexsort((rows, -scores[rows]))]
+        return rows[offset:end].tolist()
+
+    def search(self, query="", ranges=None, size=10, offset=0, fields=None, cuisines=None):
+        """
+        Same shape as the ES path: a list of recipe source dicts, limited to
+        fields when given.
+        """
+        rows = self.search_rows(query, ranges, size, offset, cuisines)
+        if fields is None:
+            return [self.store[row].to_dict() for row in rows]
+        fields = [field for field in fields if field in self.store.columns]
+        return [{field: self.store.value(row, field) for field in fields} for row in rows]
+
+    def facets(self, query="", ranges=None, cuisines=None, cuisine_size=100, histograms=None):
+        """
+        Facet counts over every match, like the ES aggregations: the top
+        cuisine tokens and, for each histograms entry (name -> (field,
+        interval)), gap-filled buckets between the lowest and highest value.
+        """
+        _, mask = self._match(query, ranges, cuisines)
+        counts = [
+            (token, int(np.count_nonzero(mask[rows]))) for token, rows in self.cuisine_rows.items()
+        ]
+        counts = sorted((c for c in counts if c[1]), key=lambda c: (-c[1], c[0]))[:cuisine_size]
+        facets = {"cuisines": [{"value": token, "count": count} for token, count in counts]}
+
+        for name, (field, interval) in (histograms or {}).items():
+            values = np.asarray(self.store.column(field), dtype=np.float64)[mask]
+            values = values[~np.isnan(values)]
+            if not len(values):
+                facets[name] = []
+                continue
+            keys = np.floor(values / interval).astype(np.int64)
+            low = keys.min()
+            bucket_counts = np.bincount(keys - low)
+            facets[name] = [
+                {"from": float((low + i) * interval), "to": float((low + i + 1) * interval), "count": int(count)}
+                for i, count in enumerate(bucket_counts)
+            ]
+        return facets
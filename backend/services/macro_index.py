@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+# (field, offset, scale) of each gauss function in the recommendation query
+GAUSS_FUNCTIONS = [
+    ("calories", 50, 100),
+    ("protein_grams", 5, 10),
+    ("carbs_grams", 10, 20),
+    ("fat_grams", 5, 10),
+]
+# Score at `scale` past the offset; ES's default decay
+DECAY = 0.5
+
+# Daily macro key on the user doc -> (catalog field, default daily amount)
+USER_MACROS = {
+    "calories": ("calories", 2000),
+    "protein": ("protein_grams", 50),
+    "carbs": ("carbs_grams", 300),
+    "fat": ("fat_grams", 70),
+}
+
+
+def meal_targets(macros, meals_per_day=3, share=None):
+    """
+    Per-meal targets by catalog field from a user's daily macros: share of
+    the day when given (see Config.MEAL_SPLITS), otherwise an even split.
+    """
+    share = share if share is not None else 1 / meals_per_day
+    return {
+        field: float(macros.get(key, default)) * share
+        for key, (field, default) in USER_MACROS.items()
+    }
+
+
+class MacroIndex:
+    """
+    Recipes as points in calories/protein/carbs/fat space, for nearest-target
+    lookups without a round trip to Elasticsearch.
+
+    The default score reproduces the ES query: for each macro a gauss decay
+    exp(-max(0, |value - target| - offset)^2 / (2 sigma^2)) with
+    sigma^2 = -scale^2 / (2 ln DECAY), multiplied together, where a missing
+    value scores 1. Dividing the distance past the offset by scale makes that
+    DECAY ** (sum of squared normalized distances), so ranking is a squared
+    Euclidean distance over the normalized matrix.
+    """
+
+    def __init__(self, store, functions=GAUSS_FUNCTIONS, decay=DECAY):
+        self.store = store
+        self.fields = [field for field, _, _ in functions]
+        # One contiguous row per macro, so each pass below streams through memory
+        self.matrix = np.stack([
+            np.asarray(store.column(field), dtype=np.float32) for field in self.fields
+        ])
+        self.offsets = [float(offset) for _, offset, _ in functions]
+        self.scales = [float(scale) for _, _, scale in functions]
+        self.log_decay = math.log(decay)
+        self.rows_by_id = {recipe_id: row for row, recipe_id in enumerate(store.column("id"))}
+        # meal type -> boolean row mask, from the ingest classification
+        self.meal_rows = {}
+        if "meal_types" in store.columns:
+            for row, meal_types in enumerate(store.column("meal_types")):
+                for meal_type in meal_types or ():
+                    if meal_type not in self.meal_rows:
+                        self.meal_rows[meal_type] = np.zeros(len(store), dtype=bool)
+                    self.meal_rows[meal_type][row] = True
+
+    def distances(self, targets):
+        """
+        Sum of squared normalized distances from targets (field -> value) for every row.
+        """
+        total = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        excess = np.empty_like(total)
+        for values, field, offset, scale in zip(self.matrix, self.fields, self.offsets, self.scales):
+            np.subtract(values, targets[field], out=excess)
+            np.abs(excess, out=excess)
+            excess -= offset
+            # fmax maps NaN to 0: a missing macro adds nothing, like ES scoring it 1
+            np.fmax(excess, 0, out=excess)
+            excess *= 1 / scale
+            excess *= excess
+            total += excess
+        return total
+
+    def scores(self, targets):
+        return np.exp(self.log_decay * self.distances(targets))
+
+    def nearest(self, targets, n=10, exclude_ids=(), meal_type=None):
+        """
+        The n recipes closest to targets, best first, as RecipeViews. With
+        meal_type, only recipes classified for that meal are considered.
+        """
+        distances = self.distances(targets)
+        excluded = {self.rows_by_id[i] for i in exclude_ids if i in self.rows_by_id}
+        if excluded:
+            distances[list(excluded)] = np.inf
+        if meal_type is not None:
+            allowed = self.meal_rows.get(meal_type)
+            if allowed is None:
+                return []
+            distances[~allowed] = np.inf
+
+        n = min(n, int(np.isfinite(distances).sum()))
+        if n <= 0:
+            return []
+        candidates = np.argpartition(distances, n - 1)[:n] if n < len(distances) else np.arange(len(distances))
+        # Sort the selected rows by (distance, row) so ties come out in catalog order
+        order = np.lexsort((candidates, distances[candidates]))
+        return [self.store[int(row)] for row in candidates[order]]
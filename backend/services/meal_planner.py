@@ -0,0 +1,196 @@
+"""
+Weekly plan optimizer: assign recipes from a candidate pool to the 7x3 meal
+slots so each day's calories, protein, carbs and fat land close to the user's
+daily targets, without repeating a recipe and preferring favorites.
+
+The cost of a plan is the sum over days of the squared relative deviation of
+the day's totals from the targets, minus FAVORITE_BONUS per favorite used,
+plus MEAL_TYPE_PENALTY per recipe in a meal it wasn't classified for at
+ingest. A randomized greedy pass fills the slots, then local search applies
+the best improving move (swap a planned recipe for an unused one, or swap two
+planned recipes) until none is left or the time budget runs out. Both passes
+stop at the budget: slots the greedy pass hasn't reached by then take the
+next unused recipes in pool order.
+"""
+import time
+
+import numpy as np
+
+from services.macro_index import USER_MACROS
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MEALS = ["Breakfast", "Lunch", "Dinner"]
+SLOTS = len(DAYS) * len(MEALS)
+# Meal types recipes are classified into at ingest (data_processing.MEAL_TYPES)
+MEAL_TYPES = [meal.lower() for meal in MEALS]
+
+# Frontend recipe keys, in USER_MACROS order (same names as the user's macros)
+MACRO_KEYS = list(USER_MACROS)
+
+TIME_BUDGET = 0.05
+# Cost credit per favorite in the plan; 0.25 is one macro 50% off for a day
+FAVORITE_BONUS = 0.25
+# Cost of each repeat when the pool is short, high enough that every recipe
+# is used once before any is used twice
+REPEAT_PENALTY = 100.0
+# Cost of a recipe in a meal it isn't classified for; recipes without a
+# classification fit every meal
+MEAL_TYPE_PENALTY = 1.0
+# The greedy pass picks at random among this many best candidates per slot,
+# so regenerating a plan from the same pool gives a different week
+GREEDY_CHOICES = 3
+
+
+def daily_targets(macros):
+    """
+    Daily calories/protein/carbs/fat targets from a user's macros, with defaults.
+    """
+    macros = macros or {}
+    return np.array([float(macros.get(key) or default) for key, (_, default) in USER_MACROS.items()])
+
+
+def recipe_macros(recipes):
+    """
+    (n, 4) matrix of frontend recipes' calories/protein/carbs/fat; missing is 0.
+    """
+    return np.array([[float(recipe.get(key) or 0) for key in MACRO_KEYS] for recipe in recipes]).reshape(-1, 4)
+
+
+def meal_misfit(recipes, penalty=MEAL_TYPE_PENALTY):
+    """
+    (n, 3) cost of putting each recipe in each meal: 0 where it fits, penalty
+    where its mealTypes leave that meal out.
+    """
+    misfit = np.zeros((len(recipes), len(MEALS)))
+    for row, recipe in enumerate(recipes):
+        meal_types = recipe.get("mealTypes")
+        if meal_types:
+            misfit[row] = [0.0 if meal_type in meal_types else penalty for meal_type in MEAL_TYPES]
+    return misfit
+
+
+def _day_costs(totals, targets, scale):
+    """
+    Squared relative deviation from targets, summed over macros, for each
+    row of day totals (any leading shape).
+    """
+    return (((totals - targets) / scale) ** 2).sum(axis=-1)
+
+
+def _greedy(matrix, credit, misfit, targets, shares, scale, rng, deadline):
+    """
+    Fill the slots meal by meal across the week, each day aiming at the share
+    of its targets eaten so far; after the deadline, with the first unused
+    rows. Returns the candidate row per slot (day-major).
+    """
+    slots = np.full(SLOTS, -1)
+    used = np.zeros(len(matrix), dtype=bool)
+    totals = np.zeros((len(DAYS), matrix.shape[1]))
+    eaten = np.cumsum(shares)
+    for meal in range(len(MEALS)):
+        goal = targets * eaten[meal]
+        for day in range(len(DAYS)):
+            if time.perf_counter() >= deadline:
+                row = int(np.argmin(used))
+            else:
+                cost = _day_costs(totals[day] + matrix, goal, scale) - credit + misfit[:, meal]
+                cost[used] = np.inf
+                choices = min(GREEDY_CHOICES, int((~used).sum()))
+                best = np.argpartition(cost, choices - 1)[:choices]
+                row = int(rng.choice(best))
+            slots[day * len(MEALS) + meal] = row
+            used[row] = True
+            totals[day] += matrix[row]
+    return slots
+
+
+def _improve(slots, matrix, credit, misfit, targets, scale, deadline):
+    """
+    Best-improvement local search over replace and swap moves, in place.
+    Returns the number of moves applied.
+    """
+    days = np.arange(SLOTS) // len(MEALS)
+    meals = np.arange(SLOTS) % len(MEALS)
+    same_day = days[:, None] == days[None, :]
+    moves = 0
+    while time.perf_counter() < deadline:
+        totals = matrix[slots].reshape(len(DAYS), len(MEALS), -1).sum(axis=1)
+        day_cost = _day_costs(totals, targets, scale)
+        planned = matrix[slots]
+        # misfit[slots[s], meal of s]
+        fit = misfit[slots, meals]
+
+        # Replace slot s's recipe with unused candidate u
+        unused = np.setdiff1d(np.arange(len(matrix)), slots)
+        best_replace = np.inf
+        if len(unused):
+            new_totals = totals[days][:, None, :] - planned[:, None, :] + matrix[unused][None, :, :]
+            replace = (_day_costs(new_totals, targets, scale) - day_cost[days][:, None]
+                       + credit[slots][:, None] - credit[unused][None, :]
+                       + misfit[unused][:, meals].T - fit[:, None])
+            s, u = np.unravel_index(np.argmin(replace), replace.shape)
+            best_replace = replace[s, u]
+
+        # Swap the recipes in slots s1 and s2; within a day only the meal fit changes
+        diff = planned[None, :, :] - planned[:, None, :]
+        swap = (_day_costs(totals[days][:, None, :] + diff, targets, scale)
+                + _day_costs(totals[days][None, :, :] - diff, targets, scale)
+                - day_cost[days][:, None] - day_cost[days][None, :])
+        swap[same_day] = 0.0
+        # s1's recipe moves to s2's meal and back
+        moved = misfit[slots][:, meals]
+        swap += moved.T + moved - fit[:, None] - fit[None, :]
+        np.fill_diagonal(swap, np.inf)
+        s1, s2 = np.unravel_index(np.argmin(swap), swap.shape)
+
+        if min(best_replace, swap[s1, s2]) >= -1e-9:
+            break
+        if best_replace <= swap[s1, s2]:
+            slots[s] = unused[u]
+        else:
+            slots[s1], slots[s2] = slots[s2], slots[s1]
+        moves += 1
+    return moves
+
+
+def plan_cost(plan_recipes, macros, favorite_ids=(), favorite_bonus=FAVORITE_BONUS,
+              meal_penalty=MEAL_TYPE_PENALTY):
+    """
+    The objective for 21 recipes in slot order (day-major): lower is better.
+    """
+    targets = daily_targets(macros)
+    totals = recipe_macros(plan_recipes).reshape(len(DAYS), len(MEALS), -1).sum(axis=1)
+    favorites = sum(1 for recipe in plan_recipes if recipe.get("id") in set(favorite_ids))
+    misfits = meal_misfit(plan_recipes, meal_penalty)[np.arange(SLOTS), np.arange(SLOTS) % len(MEALS)].sum()
+    return float(
+        _day_costs(totals, targets, np.maximum(targets, 1)).sum() - favorite_bonus * favorites + misfits
+    )
+
+
+def plan_week(recipes, macros, favorite_ids=(), time_budget=TIME_BUDGET, favorite_bonus=FAVORITE_BONUS,
+              meal_shares=None, meal_penalty=MEAL_TYPE_PENALTY, seed=None):
+    """
+    21 recipes from the pool in slot order (Monday Breakfast, Monday Lunch, ...).
+    Recipes only repeat when the pool has fewer than 21. meal_shares is the
+    fraction of the day each of MEALS aims for (default an even split).
+    """
+    if not recipes:
+        return []
+    deadline = time.perf_counter() + time_budget
+    # A short pool is repeated so every slot has a row
+    pool = recipes * -(-SLOTS // len(recipes))
+
+    targets = daily_targets(macros)
+    scale = np.maximum(targets, 1)
+    matrix = recipe_macros(pool)
+    favorite_ids = set(favorite_ids)
+    credit = np.array([favorite_bonus if recipe.get("id") in favorite_ids else 0.0 for recipe in pool])
+    credit[len(recipes):] -= REPEAT_PENALTY
+    misfit = meal_misfit(pool, meal_penalty)
+    shares = np.asarray(meal_shares if meal_shares is not None else [1.0] * len(MEALS), dtype=float)
+    shares = shares / shares.sum()
+
+    rng = np.random.default_rng(seed)
+    slots = _greedy(matrix, credit, misfit, targets, shares, scale, rng, deadline)
+    _improve(slots, matrix, credit, misfit, targets, scale, deadline)
+    return [pool[row] for row in slots]
@@ -0,0 +1,147 @@
+"""
+Generate next week's meal plans for every user ahead of the Monday rollover,
+so GET /meal-plan finds a ready plan instead of generating one in the request.
+
+Users are split into chunks and a process pool generates each chunk's plans
+(services.recommendations.generate_meal_plan), writing them with one batched
+Firestore commit per chunk to /users/{uid}/meal_plan/next. When a user's
+saved plan is from an earlier week, GET /meal-plan promotes that document to
+'current'. Only users with a saved plan get one; reruns skip users whose
+'next' plan is already for the target week unless --force is given.
+
+Run from backend/, e.g. Sunday night from cron:
+    python -m services.pregenerate_plans
+    python -m services.pregenerate_plans --workers 8 --chunk-size 200
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+from utils.dates import get_next_week_start
+
+NEXT_PLAN = "next"
+# Firestore rejects batches of more than 500 writes
+MAX_BATCH_WRITES = 500
+
+# Flask app of this worker process, with its own Firestore/Elasticsearch clients
+_app = None
+
+
+def _init_worker():
+    global _app
+    from app import app
+    _app = app
+
+
+def _plan_refs(uid):
+    plans = _app.db.collection('users').document(uid).collection('meal_plan')
+    return plans.document('current'), plans.document(NEXT_PLAN)
+
+
+def generate_chunk(uids, week_start, force=False):
+    """
+    Generate and store week_start plans for uids in one batched write.
+    Returns (written, skipped, failed) counts.
+    """
+    from services.recommendations import generate_meal_plan
+
+    batch = _app.db.batch()
+    written = skipped = failed = 0
+    with _app.app_context():
+        for uid in uids:
+            current_ref, next_ref = _plan_refs(uid)
+            if not current_ref.get().exists:
+                # Never planned a week; GET /meal-plan 404s and the frontend generates
+                skipped += 1
+                continue
+            if not force:
+                existing = next_ref.get()
+                if existing.exists and (existing.to_dict() or {}).get('week_start') == week_start:
+                    skipped += 1
+                    continue
+
+            plan = generate_meal_plan(uid)
+            if not plan:
+                failed += 1
+                continue
+            batch.set(next_ref, {"week_start": week_start, "plan": plan}, merge=False)
+            written += 1
+
+    if written:
+        try:
+            batch.commit()
+        except Exception as e:
+            print(f"Error writing plans for {len(uids)} users: {e}")
+            return 0, skipped, failed + written
+    return written, skipped, failed
+
+
+def _run_chunk(args):
+    return generate_chunk(*args)
+
+
+def user_ids(db):
+    return [doc.id for doc in db.collection('users').stream()]
+
+
+def pregenerate(db, week_start, workers, chunk_size, force=False):
+    """
+    Generate week_start plans for every user in db across `workers`
+    processes (inline when 1). Returns (written, skipped, failed) totals.
+    """
+    uids = user_ids(db)
+    chunks = [uids[i:i + chunk_size] for i in range(0, len(uids), chunk_size)]
+    print(f"Generating plans for week {week_start}: {len(uids)} users in {len(chunks)} chunks")
+
+    totals = [0, 0, 0]
+    start = time.perf_counter()
+    tasks = [(chunk, week_start, force) for chunk in chunks]
+    if workers <= 1:
+        _init_worker()
+        results = map(_run_chunk, tasks)
+        pool = None
+    else:
+        # spawn, not fork: gRPC clients (Firestore) don't survive a fork, so
+        # each worker builds its own app and clients
+        pool = multiprocessing.get_context("spawn").Pool(workers, initializer=_init_worker)
+        results = pool.imap_unordered(_run_chunk, tasks)
+    try:
+        for done, counts in enumerate(results, start=1):
+            totals = [total + count for total, count in zip(totals, counts)]
+            print(f"  chunk {done}/{len(chunks)}: {totals[0]} written, {totals[1]} skipped, "
+                  f"{totals[2]} failed ({time.perf_counter() - start:.1f}s)")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return tuple(totals)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate next week's meal plans for all users")
+    parser.add_argument("--week", default=None, help="week start (YYYY-MM-DD); default next Monday")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes (1 runs in this process)")
+    parser.add_argument("--chunk-size", type=int, default=100,
+                        help=f"users per worker task and batched write (at most {MAX_BATCH_WRITES})")
+    parser.add_argument("--force", action="store_true", help="regenerate plans already made for that week")
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.chunk_size <= MAX_BATCH_WRITES:
+        parser.error(f"--chunk-size must be between 1 and {MAX_BATCH_WRITES}")
+
+    from app import app
+    if not app.db:
+        print("Cannot generate plans. Firebase is not initialized.")
+        exit(1)
+
+    week_start = args.week or get_next_week_start()
+    written, skipped, failed = pregenerate(app.db, week_start, args.workers, args.chunk_size, args.force)
+    print(f"Done: {written} plans written, {skipped} skipped, {failed} failed")
+    if failed:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Elasticsearch queries as stored search templates. Each request sends only a
+template id and a small params dict; the query bodies live in the cluster
+(PUT _scripts/<id>), so ranking can be tuned by updating a template without a
+deploy.
+
+The sources below are what gets stored when a template is missing. When
+stored templates are unavailable (SEARCH_TEMPLATES off, or the cluster
+refused them) the same source is rendered client-side and sent as a plain
+search body, so both paths run identical queries.
+
+Push the templates in this file to the cluster, replacing what is stored:
+    python -m services.query_builder --overwrite
+"""
+import json
+import re
+from functools import lru_cache
+
+from flask import current_app as app
+
+from services.macro_index import GAUSS_FUNCTIONS
+
+SEARCH_TEMPLATE = "recipes-search"
+# Versioned: v2 added the meal_type filter, and a new id gets it stored on
+# clusters that still hold the original source
+MACRO_TEMPLATE = "recipes-macro-v2"
+AUTOCOMPLETE_TEMPLATE = "recipes-autocomplete"
+
+# ?facets=1 aggregations: top cuisine tokens plus macro histograms
+CUISINE_FACET_SIZE = 100
+HISTOGRAMS = {
+    "calories": ("calories", 100),
+    "protein": ("protein_grams", 10),
+}
+
+# Range filters /api/search can apply, by catalog field
+RANGE_FIELDS = ["protein_grams", "calories", "total_minutes", "servings"]
+
+
+def _facet_aggs():
+    aggs = {"cuisines": {"terms": {"field": "cuisine_tokens", "size": CUISINE_FACET_SIZE}}}
+    for name, (field, interval) in HISTOGRAMS.items():
+        aggs[name] = {"histogram": {"field": field, "interval": interval}}
+    return aggs
+
+
+# Optional clauses sit in {{#param}} sections and end with a comma; the
+# trailing match_all filter keeps the array valid and costs nothing.
+# List params (search_after) are guarded by a separate flag, since a mustache
+# section over a list repeats once per element.
+SEARCH_SOURCE = (
+    '{"size": {{size}},'
+    ' "query": {"bool": {'
+    '"must": [{{#query}}{"multi_match": {"query": "{{query}}", "fields": ["name", "ingredients"],'
+    ' "fuzziness": "AUTO"}}{{/query}}{{^query}}{"match_all": {}}{{/query}}],'
+    ' "filter": ['
+    + "".join(
+        f'{{{{#{field}}}}}{{"range": {{"{field}": {{{{#toJson}}}}{field}{{{{/toJson}}}}}}}},{{{{/{field}}}}}'
+        for field in RANGE_FIELDS
+    )
+    + '{{#cuisines}}{"terms": {{#toJson}}cuisines{{/toJson}}},{{/cuisines}}'
+    '{"match_all": {}}]}},'
+    # id breaks score ties so search_after pages never skip or repeat a hit
+    ' "sort": [{"_score": "desc"}, {"id": "asc"}],'
+    ' "_source": {{#toJson}}source{{/toJson}}'
+    '{{#paged}}, "search_after": {{#toJson}}after{{/toJson}}{{/paged}}'
+    '{{#facets}}, "aggs": ' + json.dumps(_facet_aggs()) + '{{/facets}}}'
+)
+
+MACRO_SOURCE = (
+    '{"size": {{size}},'
+    ' "query": {"function_score": {'
+    # meal_type is a filter, so unsuitable recipes are never scored
+    '"query": {"bool": {"must": [{"match_all": {}}],'
+    ' "filter": [{{#meal_type}}{"term": {"meal_types": "{{meal_type}}"}}{{/meal_type}}],'
+    ' "must_not": [{{#exclude}}{"ids": {{#toJson}}exclude{{/toJson}}}{{/exclude}}]}},'
+    ' "functions": ['
+    + ", ".join(
+        f'{{"gauss": {{"{field}": {{"origin": {{{{{field}}}}}, "offset": {offset}, "scale": {scale}}}}}}}'
+        for field, offset, scale in GAUSS_FUNCTIONS
+    )
+    + '], "score_mode": "multiply", "boost_mode": "multiply"}}}'
+)
+
+AUTOCOMPLETE_SOURCE = (
+    '{"_source": ["id", "name"],'
+    ' "suggest": {"recipes": {"prefix": "{{prefix}}",'
+    ' "completion": {"field": "suggest", "size": {{size}}, "skip_duplicates": true}}}}'
+)
+
+TEMPLATES = {
+    SEARCH_TEMPLATE: SEARCH_SOURCE,
+    MACRO_TEMPLATE: MACRO_SOURCE,
+    AUTOCOMPLETE_TEMPLATE: AUTOCOMPLETE_SOURCE,
+}
+
+
+def search_params(query, ranges, size, fields=None, cuisines=None, after=None, facets=False):
+    """
+    SEARCH_TEMPLATE params. ranges maps a RANGE_FIELDS field to a range body
+    like {"gte": 10}; empty ranges are left out.
+    """
+    params = {"size": size, "source": fields if fields is not None else True}
+    if query:
+        params["query"] = query
+    for field, bounds in ranges.items():
+        if bounds:
+            params[field] = bounds
+    if cuisines:
+        params["cuisines"] = {"cuisine_tokens": list(cuisines)}
+    if after is not None:
+        params["paged"] = True
+        params["after"] = after
+    if facets:
+        params["facets"] = True
+    return params
+
+
+def macro_params(targets, size, exclude_ids=None, meal_type=None):
+    """
+    MACRO_TEMPLATE params: per-meal targets by catalog field, optionally
+    restricted to recipes classified for meal_type.
+    """
+    params = {"size": size, **{field: targets[field] for field, _, _ in GAUSS_FUNCTIONS}}
+    if exclude_ids:
+        params["exclude"] = {"values": sorted(exclude_ids)}
+    if meal_type:
+        params["meal_type"] = meal_type
+    return params
+
+
+def autocomplete_params(prefix, size):
+    return {"prefix": prefix, "size": size}
+
+
+_TAG = re.compile(r"(\{\{[#^/]?\w+\}\})")
+
+
+@lru_cache(maxsize=None)
+def _compile(template_id):
+    """
+    Parse a template source once into nodes: text, ("var", name),
+    ("json", name) and ("section", name, inverted, children).
+    """
+    root = []
+    stack = [("", root)]
+    for token in _TAG.split(TEMPLATES[template_id]):
+        if not token:
+            continue
+        match = re.fullmatch(r"\{\{([#^/]?)(\w+)\}\}", token)
+        if not match:
+            stack[-1][1].append(token)
+            continue
+        kind, name = match.groups()
+        if kind in ("#", "^"):
+            children = []
+            stack[-1][1].append(("section", name, kind == "^", children))
+            stack.append((name, children))
+        elif kind == "/":
+            opened, children = stack.pop()
+            if opened != name:
+                raise ValueError(f"Template {template_id}: {{{{/{name}}}}} closes {{{{#{opened}}}}}")
+            if name == "toJson":
+                stack[-1][1].pop()
+                stack[-1][1].append(("json", "".join(children).strip()))
+        else:
+            stack[-1][1].append(("var", name))
+    if len(stack) != 1:
+        raise ValueError(f"Template {template_id}: unclosed {{{{#{stack[-1][0]}}}}}")
+    return root
+
+
+def _render_nodes(nodes, params, out):
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] == "var":
+            value = params.get(node[1], "")
+            # Like ES: values are JSON-escaped, strings without their quotes
+            out.append(json.dumps(value)[1:-1] if isinstance(value, str) else json.dumps(value))
+        elif node[0] == "json":
+            out.append(json.dumps(params.get(node[1])))
+        else:
+            _, name, inverted, children = node
+            if bool(params.get(name)) != inverted:
+                _render_nodes(children, params, out)
+
+
+def render(template_id, params):
+    """
+    The search body a stored template produces for params, rendered locally.
+    """
+    out = []
+    _render_nodes(_compile(template_id), params, out)
+    return json.loads("".join(out))
+
+
+def install_templates(client, overwrite=False):
+    """
+    Store TEMPLATES in the cluster. Existing templates are left alone unless
+    overwrite is set, so ones tuned in place survive restarts. Returns the ids
+    written.
+    """
+    from elasticsearch import NotFoundError
+
+    installed = []
+    for template_id, source in TEMPLATES.items():
+        if not overwrite:
+            try:
+                client.get_script(id=template_id)
+                continue
+            except NotFoundError:
+                pass
+        client.put_script(id=template_id, script={"lang": "mustache", "source": source})
+        installed.append(template_id)
+    return installed
+
+
+def _stored():
+    return bool(getattr(app, "search_templates", False))
+
+
+def search(client, index, template_id, params):
+    if _stored():
+        return client.search_template(index=index, id=template_id, params=params)
+    return client.search(index=index, body=render(template_id, params))
+
+
+async def search_async(client, index, template_id, params):
+    """
+    search() on an AsyncElasticsearch client.
+    """
+    if _stored():
+        return await client.search_template(index=index, id=template_id, params=params)
+    return await client.search(index=index, body=render(template_id, params))
+
+
+def msearch(client, index, template_id, params_list):
+    """
+    One template run per params dict in a single request; response items in order.
+    """
+    if _stored():
+        searches = []
+        for params in params_list:
+            searches.extend([{}, {"id": template_id, "params": params}])
+        return client.msearch_template(index=index, search_templates=searches)
+    searches = []
+    for params in params_list:
+        searches.extend([{}, render(template_id, params)])
+    return client.msearch(index=index, searches=searches)
+
+
+def main(argv=None):
+    import argparse
+    from services.elastic import init_elastic
+
+    parser = argparse.ArgumentParser(description="Store the search templates in Elasticsearch")
+    parser.add_argument("--overwrite", action="store_true", help="replace templates already stored")
+    parser.add_argument("--print", dest="show", action="store_true", help="print the template sources and exit")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        for template_id, source in TEMPLATES.items():
+            print(f"{template_id}:\n  {source}")
+        return
+
+    client, _ = init_elastic() or (None, None)
+    if client is None:
+        print("Cannot store templates. Elasticsearch client is not connected.")
+        exit(1)
+    installed = install_templates(client, overwrite=args.overwrite)
+    print(f"Stored templates: {', '.join(installed) or 'none (all present)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from flask import current_app as app
-from utils.formatters import format_recipe_for_frontend
+from services import query_builder
+from services.query_builder import MACRO_TEMPLATE
+from utils.formatters import format_recipe_for_frontend, recipe_id_for
 
 def get_favorite_recipes(uid):
     """
@@ -24,77 +26,264 @@ def get_favorite_recipes(uid):
         return []
 
 
-def get_fallback_recipes(macros, count_needed, exclude_ids=None):
+def _quantize(value, step):
+    return round(value / step) * step if step else value
+
+
+def meal_share(meal_type):
+    """
+    Fraction of the daily macros meal_type aims for, from Config.MEAL_SPLITS
+    (None, an even split, for no meal type or one the splits don't name).
+    """
+    splits = app.config.get("MEAL_SPLITS") or {}
+    total = sum(splits.values())
+    if not meal_type or meal_type not in splits or total <= 0:
+        return None
+    return splits[meal_type] / total
+
+
+def slot_targets(macros, meal_type=None):
+    from services.macro_index import meal_targets
+    return meal_targets(macros, share=meal_share(meal_type))
+
+
+def candidate_lookup(macros, meal_type=None):
+    """
+    First half of macro_candidates, shared with the async handlers:
+    (cache key or None, cached candidates or None, MACRO_TEMPLATE params to run on a miss).
+    """
+    targets = slot_targets(macros, meal_type)
+
+    key = None
+    if app.candidate_cache is not None:
+        calorie_step = app.config.get("MACRO_BUCKET_CALORIES", 50)
+        gram_step = app.config.get("MACRO_BUCKET_GRAMS", 5)
+        targets = {
+            field: _quantize(value, calorie_step if field == "calories" else gram_step)
+            for field, value in targets.items()
+        }
+        key = (meal_type, *sorted(targets.items()))
+        cached = app.candidate_cache.get(key)
+        if cached is not None:
+            return key, cached, None
+
+    return key, None, query_builder.macro_params(
+        targets, app.config.get("CANDIDATE_POOL_SIZE", 100), meal_type=meal_type
+    )
+
+
+def remember_candidates(key, response):
+    """
+    Second half of macro_candidates: the ranked sources from response, cached under key.
     """
-    Get recipes from Elasticsearch that match user macros.
+    candidates = [hit['_source'] for hit in response['hits']['hits']]
+    if key is not None:
+        # Neighbouring buckets rank mostly the same recipes; hold one copy of each
+        shared = app.candidate_sources
+        candidates = [
+            shared.setdefault((recipe.get("id"), recipe.get("content_hash")), recipe)
+            for recipe in candidates
+        ]
+        app.candidate_cache.set(key, candidates)
+    return candidates
+
+
+def macro_candidates(macros, meal_type=None):
+    """
+    Recipes ranked by closeness to a user's per-meal macro targets, from the
+    recipes-macro search template; with meal_type, only recipes classified for
+    that meal, ranked against its share of the day. Targets are rounded to the
+    configured buckets (MACRO_BUCKET_CALORIES / MACRO_BUCKET_GRAMS) and the
+    ranked list for each bucket is cached, so users with similar macros share
+    one query; callers filter out what they can't use. Without the cache,
+    exact targets are used.
+    """
+    key, cached, template_params = candidate_lookup(macros, meal_type)
+    if cached is not None:
+        return cached
+    response = query_builder.search(app.client, app.INDEX_NAME, MACRO_TEMPLATE, template_params)
+    return remember_candidates(key, response)
+
+
+def get_fallback_recipes(macros, count_needed, exclude_ids=None, meal_type=None):
+    """
+    Get recipes that match user macros, from the in-process macro index when
+    it is enabled, otherwise from Elasticsearch.
     Avoid duplicates by excluding recipe IDs in exclude_ids.
+    With meal_type, only recipes classified for that meal are returned; if
+    there aren't enough, the rest come from the whole catalog.
     """
-    if not app.client or not app.INDEX_NAME:
-        return []
-    
+    results = _fallback_recipes(macros, count_needed, exclude_ids, meal_type)
+    if meal_type and len(results) < count_needed:
+        exclude_ids = set(exclude_ids or ()) | {recipe["id"] for recipe in results}
+        results += _fallback_recipes(macros, count_needed - len(results), exclude_ids)
+    return results
+
+
+def _fallback_recipes(macros, count_needed, exclude_ids=None, meal_type=None):
     if exclude_ids is None:
         exclude_ids = set()
     else:
         exclude_ids = set(exclude_ids)
+
+    if app.macro_index is not None:
+        try:
+            nearest = app.macro_index.nearest(
+                slot_targets(macros, meal_type), count_needed, exclude_ids, meal_type=meal_type
+            )
+            return [format_recipe_for_frontend(recipe, recipe_id=recipe["id"]) for recipe in nearest]
+        except Exception as e:
+            print(f"Error fetching fallback recipes: {e}")
+            return []
+
+    if not app.client or not app.INDEX_NAME:
+        return []
     
     try:
-        daily_calories = float(macros.get('calories', 2000))
-        daily_protein = float(macros.get('protein', 50))
-        daily_carbs = float(macros.get('carbs', 300))
-        daily_fat = float(macros.get('fat', 70))
-        
-        # Per-meal targets (assuming 3 meals per day)
-        target_calories = daily_calories / 3
-        target_protein = daily_protein / 3
-        target_carbs = daily_carbs / 3
-        target_fat = daily_fat / 3
-        
-        # Fetch more than needed to account for duplicates
-        fetch_size = min(count_needed * 3, 100)
-        
-        search_body = {
-            "size": fetch_size,
-            "query": {
-                "function_score": {
-                    "query": {"match_all": {}},
-                    "functions": [
-                        {"gauss": {"calories": {"origin": target_calories, "offset": 50, "scale": 100}}},
-                        {"gauss": {"protein_grams": {"origin": target_protein, "offset": 5, "scale": 10}}},
-                        {"gauss": {"carbs_grams": {"origin": target_carbs, "offset": 10, "scale": 20}}},
-                        {"gauss": {"fat_grams": {"origin": target_fat, "offset": 5, "scale": 10}}},
-                    ],
-                    "score_mode": "multiply",
-                    "boost_mode": "multiply"
-                }
-            }
-        }
+        return pick_recipes(macro_candidates(macros, meal_type), count_needed, exclude_ids)
+    except Exception as e:
+        print(f"Error fetching fallback recipes: {e}")
+        return []
+
+
+def pick_recipes(candidates, count_needed, exclude_ids):
+    """
+    The first count_needed candidates not in exclude_ids, in frontend format.
+    """
+    results = []
+    seen_ids = set(exclude_ids)
+    
+    for recipe in candidates:
+        recipe_id = recipe.get("id") or recipe_id_for(recipe)
         
-        response = app.client.search(index=app.INDEX_NAME, body=search_body)
-        results = []
-        seen_ids = set(exclude_ids)
+        # Skip if already seen
+        if recipe_id in seen_ids:
+            continue
         
-        for hit in response['hits']['hits']:
-            recipe = hit['_source']
-            import hashlib
-            source = recipe.get("url") or recipe.get("name") or ""
-            recipe_id = hashlib.sha1(str(source).encode('utf-8')).hexdigest() if source else ""
-            
-            # Skip if already seen
-            if recipe_id in seen_ids:
-                continue
+        formatted = format_recipe_for_frontend(recipe, recipe_id=recipe_id)
+        if formatted:
+            results.append(formatted)
+            seen_ids.add(recipe_id)
             
-            formatted = format_recipe_for_frontend(recipe, recipe_id=recipe_id)
-            if formatted:
-                results.append(formatted)
-                seen_ids.add(recipe_id)
-                
-                if len(results) >= count_needed:
-                    break
-        
-        return results
-    except Exception as e:
-        print(f"Error fetching fallback recipes: {e}")
+            if len(results) >= count_needed:
+                break
+    
+    return results
+
+
+def get_fallback_recipes_batch(macros, requests):
+    """
+    get_fallback_recipes for many (count_needed, exclude_ids, meal_type)
+    requests from the same user at once, returning one list per request.
+    With the macro index every request is answered in-process. Otherwise each
+    meal type's ranked candidates (macro_candidates) are looked up once, along
+    with the whole catalog's for topping up short meal types; the ones the
+    candidate cache misses are fetched in a single msearch, and each request
+    is then filtered from them.
+    """
+    if app.macro_index is not None:
+        return [
+            get_fallback_recipes(macros, count, exclude_ids, meal_type)
+            for count, exclude_ids, meal_type in requests
+        ]
+
+    if not app.client or not app.INDEX_NAME:
+        return [[] for _ in requests]
+
+    meal_types = list(dict.fromkeys(meal_type for _, _, meal_type in requests))
+    if any(meal_types) and None not in meal_types:
+        meal_types.append(None)
+
+    candidates = {}
+    misses = []
+    for meal_type in meal_types:
+        key, cached, template_params = candidate_lookup(macros, meal_type)
+        if cached is not None:
+            candidates[meal_type] = cached
+        else:
+            misses.append((meal_type, key, template_params))
+
+    if misses:
+        try:
+            response = query_builder.msearch(
+                app.client, app.INDEX_NAME, MACRO_TEMPLATE, [params for _, _, params in misses]
+            )
+        except Exception as e:
+            print(f"Error fetching fallback recipes: {e}")
+            response = {"responses": [{"error": str(e)} for _ in misses]}
+        for (meal_type, key, _), item in zip(misses, response['responses']):
+            if 'error' in item:
+                print(f"Error fetching fallback recipes: {item['error']}")
+                candidates[meal_type] = []
+            else:
+                candidates[meal_type] = remember_candidates(key, item)
+
+    results = []
+    for count, exclude_ids, meal_type in requests:
+        picked = pick_recipes(candidates[meal_type], count, exclude_ids or ())
+        if meal_type and len(picked) < count:
+            # Too few classified for this meal: top up from the whole catalog
+            seen = set(exclude_ids or ()) | {recipe["id"] for recipe in picked}
+            picked += pick_recipes(candidates[None], count - len(picked), seen)
+        results.append(picked)
+    return results
+
+def favorite_pool(favorites):
+    """
+    Start the plan's recipe pool with the user's favorites: (recipes, used IDs).
+    """
+    all_recipes = []
+    used_ids = set()
+    add_to_pool(all_recipes, used_ids, favorites)
+    return all_recipes, used_ids
+
+
+def add_to_pool(all_recipes, used_ids, recipes):
+    for recipe in recipes:
+        if recipe and recipe.get("id") and recipe["id"] not in used_ids:
+            all_recipes.append(recipe)
+            used_ids.add(recipe["id"])
+
+
+def plan_pool_size():
+    """
+    How many recipes to gather for the planner to choose 21 from.
+    """
+    from services.meal_planner import SLOTS
+    return max(SLOTS, app.config.get("MEAL_PLAN_POOL_SIZE", 60))
+
+
+def pool_requests(have, used_ids):
+    """
+    get_fallback_recipes_batch requests that fill a plan pool already holding
+    have recipes: an even part of the rest for each meal type.
+    """
+    from services.meal_planner import MEAL_TYPES
+    needed = plan_pool_size() - have
+    if needed <= 0:
         return []
+    per_meal = -(-needed // len(MEAL_TYPES))
+    return [(per_meal, set(used_ids), meal_type) for meal_type in MEAL_TYPES]
+
+
+def assemble_meal_plan(all_recipes, macros=None, favorite_ids=()):
+    """
+    Lay a recipe pool out over the week, choosing and placing recipes so each
+    day's totals come close to the user's daily macros (services.meal_planner):
+    { "Monday": { "Breakfast": Recipe, ... }, ... }
+    """
+    from services.meal_planner import DAYS, MEAL_TYPES, MEALS, plan_week
+
+    shares = [meal_share(meal_type) for meal_type in MEAL_TYPES]
+    chosen = plan_week(
+        all_recipes, macros, favorite_ids,
+        time_budget=app.config.get("MEAL_PLAN_TIME_BUDGET_MS", 50) / 1000,
+        favorite_bonus=app.config.get("MEAL_PLAN_FAVORITE_BONUS", 0.25),
+        meal_shares=None if None in shares else shares,
+    )
+    slots = iter(chosen)
+    return {day: {meal: next(slots) for meal in MEALS} for day in DAYS}
+
 
 def generate_meal_plan(uid):
     """
@@ -118,52 +307,13 @@ def generate_meal_plan(uid):
         # Get favorites
         favorites = get_favorite_recipes(uid)
         
-        # Collect all available recipes
-        all_recipes = []
-        used_ids = set()
-        
-        # Add favorites first
-        for fav in favorites:
-            if fav and fav.get("id"):
-                all_recipes.append(fav)
-                used_ids.add(fav["id"])
-        
-        # Get fallback recipes if needed (21 meals = 7 days × 3 meals)
-        needed = 21 - len(all_recipes)
-        if needed > 0:
-            fallbacks = get_fallback_recipes(macros, needed, exclude_ids=used_ids)
-            for fb in fallbacks:
-                if fb and fb.get("id") and fb["id"] not in used_ids:
-                    all_recipes.append(fb)
-                    used_ids.add(fb["id"])
-        
-        # If still not enough, repeat some (unavoidable case)
-        import random
-        if len(all_recipes) < 21:
-            while len(all_recipes) < 21:
-                all_recipes.append(random.choice(all_recipes))
-        
-        # Shuffle for random distribution
-        random.shuffle(all_recipes)
-        
-        # Build meal plan structure
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        meals = ["Breakfast", "Lunch", "Dinner"]
-        
-        plan = {}
-        recipe_index = 0
+        all_recipes, used_ids = favorite_pool(favorites)
         
-        for day in days:
-            plan[day] = {}
-            for meal in meals:
-                if recipe_index < len(all_recipes):
-                    plan[day][meal] = all_recipes[recipe_index]
-                    recipe_index += 1
-                else:
-                    # Fallback if somehow we don't have enough
-                    plan[day][meal] = all_recipes[recipe_index % len(all_recipes)]
-                    recipe_index += 1
+        # Top up with macro matches for each meal so the planner has more than 21 to choose from
+        for fallbacks in get_fallback_recipes_batch(macros, pool_requests(len(all_recipes), used_ids)):
+            add_to_pool(all_recipes, used_ids, fallbacks)
         
+        plan = assemble_meal_plan(all_recipes, macros, {recipe["id"] for recipe in favorites})
         return plan
     except Exception as e:
         print(f"Error generating meal plan: {e}")
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+
+    If generation_fn is given it is called at most every check_interval
+    seconds on lookup, and the cache is cleared whenever its return value
+    changes (e.g. the index an alias points at), so a reindex is picked up
+    without waiting for the TTL. on_invalidate, if given, is called after
+    such a clear. Callers that must not block on lookup (the ASGI app) set
+    generation_fn to None and feed update_generation from a background task
+    instead, so get only ever compares against the last value seen.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, generation_fn=None, check_interval=10.0,
+                 on_invalidate=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation_fn = generation_fn
+        self.check_interval = check_interval
+        self.on_invalidate = on_invalidate
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._next_check = 0.0
+
+    def _check_generation(self, now):
+        with self._lock:
+            if self.generation_fn is None or now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+
+        # Outside the lock: this may be a network call
+        try:
+            generation = self.generation_fn()
+        except Exception as e:
+            print(f"Warning: cache generation check failed: {e}")
+            return
+        self.update_generation(generation)
+
+    def update_generation(self, generation):
+        """
+        Record the current generation, clearing the cache if it changed.
+        """
+        with self._lock:
+            invalidated = self._generation is not None and generation != self._generation
+            if invalidated:
+                self._data.clear()
+                self.invalidations += 1
+            self._generation = generation
+
+        if invalidated and self.on_invalidate is not None:
+            self.on_invalidate()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        self._check_generation(now)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Bump when the on-disk layout below changes
+CACHE_FORMAT = 2
+
+
+def cache_key(csv_path, code_files):
+    """
+    Hash of the source CSV plus the code that processes it, so editing either
+    invalidates the cached catalog.
+    """
+    digest = hashlib.sha256(f"format:{CACHE_FORMAT}".encode("utf-8"))
+    for path in [csv_path, *code_files]:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def save_frame(df, cache_dir, key):
+    """
+    Write df as one .npy file per column: numeric columns as-is, text columns
+    as a UTF-8 blob plus character offsets and a missing-value mask. Columns
+    holding lists or dicts are stored the same way, one JSON document per row.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f".tmp-{key}-", dir=cache_dir)
+    columns = []
+    try:
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            prefix = os.path.join(tmp_dir, f"{i}")
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                np.save(f"{prefix}.npy", series.to_numpy())
+                columns.append({"name": name, "kind": "numeric"})
+                continue
+
+            missing = series.isna().to_numpy()
+            kind = "json" if any(isinstance(v, (list, dict)) for v in series) else "text"
+            encode = json.dumps if kind == "json" else str
+            values = ["" if m else encode(v) for v, m in zip(series, missing)]
+            offsets = np.zeros(len(values) + 1, dtype=np.int64)
+            np.cumsum([len(v) for v in values], out=offsets[1:])
+            blob = np.frombuffer("".join(values).encode("utf-8"), dtype=np.uint8)
+            np.save(f"{prefix}.utf8.npy", blob)
+            np.save(f"{prefix}.offsets.npy", offsets)
+            np.save(f"{prefix}.missing.npy", missing)
+            columns.append({"name": name, "kind": kind})
+
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"key": key, "rows": len(df), "columns": columns}, f)
+
+        final_dir = os.path.join(cache_dir, key)
+        shutil.rmtree(final_dir, ignore_errors=True)
+        os.replace(tmp_dir, final_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Only one catalog version is ever useful; drop the rest
+    for entry in os.listdir(cache_dir):
+        if entry != key and not entry.startswith(".tmp-"):
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+
+def load_frame(cache_dir, key):
+    """
+    Load a frame written by save_frame, or return None if there is no entry for key.
+    Numeric columns are read-only views of the memory-mapped .npy files (pages
+    load on first access and are shared between processes); text and JSON
+    columns are decoded into Python objects up front.
+    """
+    entry_dir = os.path.join(cache_dir, key)
+    try:
+        with open(os.path.join(entry_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        prefix = os.path.join(entry_dir, f"{i}")
+        if column["kind"] == "numeric":
+            # Series without a copy, so the frame below keeps the memmap too
+            data[column["name"]] = pd.Series(np.load(f"{prefix}.npy", mmap_mode="r"), copy=False)
+            continue
+
+        text = np.load(f"{prefix}.utf8.npy", mmap_mode="r").tobytes().decode("utf-8")
+        offsets = np.load(f"{prefix}.offsets.npy").tolist()
+        missing = np.load(f"{prefix}.missing.npy").tolist()
+        decode = json.loads if column["kind"] == "json" else str
+        data[column["name"]] = [
+            None if missing[j] else decode(text[offsets[j]:offsets[j + 1]])
+            for j in range(meta["rows"])
+        ]
+
+    # copy=False stops the numeric columns being consolidated into a new block
+    return pd.DataFrame(data, columns=[c["name"] for c in meta["columns"]], copy=False)
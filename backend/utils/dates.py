@@ -7,4 +7,13 @@ def get_current_week_start():
     # Get Monday (weekday 0)
     days_since_monday = today.weekday()
     monday = today - timedelta(days=days_since_monday)
-    return monday.strftime("%Y-%m-%d")
\ No newline at end of file
+    return monday.strftime("%Y-%m-%d")
+
+def get_next_week_start():
+    """
+    Returns the Monday date of next week in YYYY-MM-DD format.
+    """
+    from datetime import datetime, timedelta
+    today = datetime.now()
+    monday = today - timedelta(days=today.weekday()) + timedelta(weeks=1)
+    return monday.strftime("%Y-%m-%d")
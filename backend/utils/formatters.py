@@ -1,59 +1,139 @@
+import hashlib
+import re
+
+_VULGAR_FRACTIONS = {
+    "½": 1 / 2, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 1 / 4, "¾": 3 / 4, "⅕": 1 / 5,
+    "⅖": 2 / 5, "⅗": 3 / 5, "⅘": 4 / 5, "⅙": 1 / 6, "⅚": 5 / 6, "⅛": 1 / 8,
+    "⅜": 3 / 8, "⅝": 5 / 8, "⅞": 7 / 8,
+}
+_VULGAR = "".join(_VULGAR_FRACTIONS)
+
+_UNITS = [
+    "cups?", "tablespoons?", "tbsps?", "teaspoons?", "tsps?", "pounds?", "lbs?", "fluid ounces?",
+    "ounces?", "oz", "grams?", "g", "kilograms?", "kg", "milliliters?", "ml", "liters?", "pints?",
+    "quarts?", "gallons?", "pinch(?:es)?", "dash(?:es)?", "cloves?", "cans?", "packages?", "slices?",
+    "sticks?", "sprigs?", "bunch(?:es)?", "heads?", "jars?", "bottles?", "containers?",
+    "envelopes?", "sheets?", "drops?", "stalks?",
+]
+
+_INGREDIENT = re.compile(
+    r"^\s*(?:"
+    rf"(?P<mixed>\d+)\s+(?P<mixed_num>\d+)/(?P<mixed_den>\d+)"
+    r"|(?P<num>\d+)/(?P<den>\d+)"
+    rf"|(?P<number>\d+(?:\.\d+)?)\s*(?P<number_vulgar>[{_VULGAR}])?"
+    rf"|(?P<vulgar>[{_VULGAR}])"
+    r")?\s*"
+    r"(?:\((?P<size>[^)]*)\)\s*)?"
+    rf"(?:(?P<unit>{'|'.join(_UNITS)})\b\.?\s*)?"
+    r"(?P<name>.*)$",
+    re.IGNORECASE,
+)
+
+
+def recipe_id_for(recipe):
+    """
+    Canonical recipe ID: sha1 of the recipe URL, falling back to its name.
+    Assigned once at ingest; only use this for recipes that don't carry an "id".
+    """
+    source = recipe.get("url") or recipe.get("name") or recipe.get("recipe_name") or ""
+    return hashlib.sha1(str(source).encode('utf-8')).hexdigest() if source else ""
+
+
+# Lean recipe shape for result lists
+DISPLAY_FIELDS = [
+    "id", "name", "url", "img_src", "prep_time", "total_time",
+    "calories", "protein_grams", "fat_grams", "carbs_grams",
+]
+
+
 def format_recipe_for_display(full_recipe):
     if not full_recipe:
         return None
     
+    display = {field: full_recipe.get(field) for field in DISPLAY_FIELDS}
+    display["id"] = display["id"] or recipe_id_for(full_recipe)
+    return display
+
+
+def split_ingredients(ingredients_str):
+    """
+    Split an ingredients string on commas, semicolons and newlines.
+    """
+    if isinstance(ingredients_str, list):
+        return ingredients_str
+    if not isinstance(ingredients_str, str):
+        return []
+    return [ing.strip() for ing in re.split(r'[,;\n\r]+', ingredients_str) if ing.strip()]
+
+
+def parse_ingredient(line):
+    """
+    Break one ingredient line into quantity, unit and name, e.g.
+    "1 ½ cups white sugar" -> {"quantity": 1.5, "unit": "cups", "name": "white sugar"}.
+    Fields that can't be found are None; "text" always holds the original line.
+    """
+    match = _INGREDIENT.match(line)
+    groups = match.groupdict()
+
+    quantity = None
+    if groups["mixed"]:
+        quantity = int(groups["mixed"]) + int(groups["mixed_num"]) / int(groups["mixed_den"])
+    elif groups["num"] and int(groups["den"]):
+        quantity = int(groups["num"]) / int(groups["den"])
+    elif groups["number"]:
+        quantity = float(groups["number"]) + _VULGAR_FRACTIONS.get(groups["number_vulgar"], 0)
+    elif groups["vulgar"]:
+        quantity = _VULGAR_FRACTIONS[groups["vulgar"]]
+
     return {
-        "name": full_recipe.get("name"),
-        "url": full_recipe.get("url"),
-        "img_src": full_recipe.get("img_src"),
-        "prep_time": full_recipe.get("prep_time"),
-        "total_time": full_recipe.get("total_time"),
-        "calories": full_recipe.get("calories"),
-        "protein_grams": full_recipe.get("protein_grams"),
-        "fat_grams": full_recipe.get("fat_grams"),
-        "carbs_grams": full_recipe.get("carbs_grams"),
+        "text": line,
+        "quantity": round(quantity, 3) if quantity is not None else None,
+        "unit": groups["unit"].lower() if groups["unit"] else None,
+        "name": groups["name"].strip() or None,
     }
 
 
+def split_directions(directions_str):
+    """
+    Split directions into steps: by line, else by sentence, else by numbered list.
+    """
+    if isinstance(directions_str, list):
+        return directions_str
+    if not isinstance(directions_str, str):
+        return []
+    # Try splitting by newlines first (most common format)
+    instructions = [inst.strip() for inst in re.split(r'[\n\r]+', directions_str) if inst.strip()]
+    # If that didn't work well, try splitting by periods
+    if len(instructions) <= 1:
+        instructions = [inst.strip() for inst in re.split(r'\.\s+', directions_str) if inst.strip()]
+    # If still not working, try numbered list pattern
+    if len(instructions) <= 1:
+        instructions = [inst.strip() for inst in re.split(r'(?=\d+\.\s)', directions_str) if inst.strip()]
+    return instructions
+
+
 def format_recipe_for_frontend(full_recipe, recipe_id=None):
     """
     Transform ES/Firebase recipe into frontend shape.
+    Indexed recipes carry ingredients_parsed and instructions from ingest, so
+    only older documents and favorites still get split here.
     """
     if not full_recipe:
         return None
     
-    import hashlib
-    import re
-    
-    # Generate ID if not provided
+    # Recipes from the index carry their ID; hash only for older documents
     if not recipe_id:
-        source = full_recipe.get("url") or full_recipe.get("name") or ""
-        recipe_id = hashlib.sha1(str(source).encode('utf-8')).hexdigest() if source else ""
+        recipe_id = full_recipe.get("id") or recipe_id_for(full_recipe)
     
-    # Split ingredients by comma, newline, or semicolon
-    ingredients_str = full_recipe.get("ingredients", "")
-    if isinstance(ingredients_str, list):
-        ingredients = ingredients_str
-    elif isinstance(ingredients_str, str):
-        ingredients = [ing.strip() for ing in re.split(r'[,;\n\r]+', ingredients_str) if ing.strip()]
+    parsed = full_recipe.get("ingredients_parsed")
+    if isinstance(parsed, list):
+        ingredients = [ing.get("text", "") for ing in parsed]
     else:
-        ingredients = []
+        ingredients = split_ingredients(full_recipe.get("ingredients", ""))
     
-    # Split directions/instructions by period, newline, or numbered list
-    directions_str = full_recipe.get("directions", "") or full_recipe.get("instructions", "")
-    if isinstance(directions_str, list):
-        instructions = directions_str
-    elif isinstance(directions_str, str):
-        # Try splitting by newlines first (most common format)
-        instructions = [inst.strip() for inst in re.split(r'[\n\r]+', directions_str) if inst.strip()]
-        # If that didn't work well, try splitting by periods
-        if len(instructions) <= 1:
-            instructions = [inst.strip() for inst in re.split(r'\.\s+', directions_str) if inst.strip()]
-        # If still not working, try numbered list pattern
-        if len(instructions) <= 1:
-            instructions = [inst.strip() for inst in re.split(r'(?=\d+\.\s)', directions_str) if inst.strip()]
-    else:
-        instructions = []
+    instructions = full_recipe.get("instructions")
+    if not isinstance(instructions, list):
+        instructions = split_directions(full_recipe.get("directions", "") or full_recipe.get("instructions", ""))
     
     return {
         "id": recipe_id,
@@ -67,5 +147,6 @@ def format_recipe_for_frontend(full_recipe, recipe_id=None):
         "servings": int(full_recipe.get("servings") or full_recipe.get("yield") or 1) if full_recipe.get("servings") or full_recipe.get("yield") else 1,
         "ingredients": ingredients,
         "instructions": instructions,
+        "mealTypes": list(full_recipe.get("meal_types") or full_recipe.get("mealTypes") or []),
         "tags": []
     }
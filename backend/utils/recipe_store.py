@@ -0,0 +1,138 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_processing import NUTRIENTS, RECIPES_CSV, load_processed_frame
+
+# Stored as float32 with NaN for missing values
+MACRO_COLUMNS = [*NUTRIENTS, 'calories']
+
+
+def _to_python(value, dtype):
+    if np.isnan(value):
+        return ""
+    if dtype == 'int':
+        return int(value)
+    # str of a float32 is its shortest round-trip form (1.2, not 1.2000000476837158)
+    return float(str(value)) if dtype == 'float32' else float(value)
+
+
+class RecipeView:
+    """
+    Read-only, dict-like view of one row of a RecipeStore. Missing values read
+    as "" so a view can stand in for a record from data_processing.records().
+    """
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._store.value(self._row, key)
+
+    def __contains__(self, key):
+        return key in self._store.columns
+
+    def get(self, key, default=None):
+        if key not in self._store.columns:
+            return default
+        return self._store.value(self._row, key)
+
+    def keys(self):
+        return list(self._store.columns)
+
+    def to_dict(self):
+        return {key: self._store.value(self._row, key) for key in self._store.columns}
+
+    def __repr__(self):
+        return f"RecipeView({self._row}, name={self.get('name')!r})"
+
+
+class RecipeStore:
+    """
+    Column-oriented in-process recipe catalog.
+    Numeric columns are contiguous NumPy arrays (macros as float32) and text
+    columns are lists of interned strings, so repeated values such as times,
+    yields and cuisine paths share one object. List columns (parsed
+    ingredients, instructions) are kept as they are.
+    """
+
+    def __init__(self, numeric, text, dtypes, size):
+        self.numeric = numeric
+        self.text = text
+        self.dtypes = dtypes
+        self.columns = list(dtypes)
+        self.size = size
+
+    @classmethod
+    def from_frame(cls, df):
+        numeric, text, dtypes = {}, {}, {}
+        for name in df.columns:
+            series = df[name]
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                if name in MACRO_COLUMNS:
+                    dtypes[name] = 'float32'
+                elif pd.api.types.is_integer_dtype(series):
+                    dtypes[name] = 'int'
+                else:
+                    dtypes[name] = 'float64'
+                numeric[name] = np.ascontiguousarray(
+                    series.to_numpy(dtype=np.float32 if dtypes[name] == 'float32' else np.float64)
+                )
+            elif any(isinstance(v, list) for v in series):
+                dtypes[name] = 'list'
+                text[name] = [v if isinstance(v, list) else [] for v in series]
+            else:
+                dtypes[name] = 'text'
+                text[name] = [sys.intern(v) if isinstance(v, str) else "" for v in series]
+        return cls(numeric, text, dtypes, len(df))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if not -self.size <= row < self.size:
+            raise IndexError(row)
+        return RecipeView(self, row % self.size)
+
+    def __iter__(self):
+        for row in range(self.size):
+            yield RecipeView(self, row)
+
+    def value(self, row, key):
+        dtype = self.dtypes[key]
+        if dtype in ('text', 'list'):
+            return self.text[key][row]
+        return _to_python(self.numeric[key][row], dtype)
+
+    def column(self, key):
+        """
+        The backing array (numeric) or list (text) for a column. Do not modify it.
+        """
+        return self.numeric[key] if key in self.numeric else self.text[key]
+
+    def nbytes(self):
+        """
+        Approximate memory held by the store, counting each distinct string once
+        (list columns only count their outer list).
+        """
+        total = sum(array.nbytes for array in self.numeric.values())
+        seen = set()
+        for name, values in self.text.items():
+            total += sys.getsizeof(values)
+            if self.dtypes[name] == 'list':
+                continue
+            for value in values:
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    total += sys.getsizeof(value)
+        return total
+
+
+def load_recipe_store(csv_path=RECIPES_CSV):
+    """
+    The processed catalog as a RecipeStore (served from the catalog cache when fresh).
+    """
+    return RecipeStore.from_frame(load_processed_frame(csv_path))
@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useMemo } from "react";
 import { Card, CardContent } from "./ui/card";
 import { recipes } from "./data/recipes";
+import { SEARCH_FIELDS } from "./data/search";
 import { Button } from "./ui/button";
 import { Badge } from "./ui/badge";
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from "./ui/dialog";
@@ -309,6 +310,7 @@ export function MealPlan() {
     try {
       const params = new URLSearchParams();
       params.set("q", q);
+      params.set("fields", SEARCH_FIELDS);
       const res = await fetch(
         `http://localhost:5000/api/search?${params.toString()}`
       );
@@ -8,6 +8,7 @@ import { ImageWithFallback } from "./figma/ImageWithFallback";
 import { Search, Clock, Users, Heart, ChevronLeft, ChevronRight } from "lucide-react";
 import { auth } from "../firebase/firebase";
 import { onAuthStateChanged } from "firebase/auth";
+import { SEARCH_FIELDS } from "./data/search";
 
 interface Recipe {
   id?: string;
@@ -168,6 +169,7 @@ export function RecipeSearch() {
       if (minProtein > 0) params.set("min_protein", String(minProtein));
       if (minCalories > 0) params.set("min_calories", String(minCalories));
       if (maxCalories > 0) params.set("max_calories", String(maxCalories));
+      params.set("fields", SEARCH_FIELDS);
 
       const res = await fetch(`http://localhost:5000/api/search?${params.toString()}`);
       const data = await res.json();
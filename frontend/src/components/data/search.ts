@@ -0,0 +1,7 @@
+// src/data/search.ts
+
+// Fields the search results and recipe dialogs use; /api/search returns a lean
+// display shape unless asked for more
+export const SEARCH_FIELDS =
+  "id,name,url,img_src,prep_time,cook_time,total_time,servings,yield,rating," +
+  "cuisine_path,calories,protein_grams,fat_grams,carbs_grams,ingredients,directions";